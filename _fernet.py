@@ -0,0 +1,125 @@
+"""
+Fernet implementations shared by the server and the client-side scripts.
+
+`Fernet` uses the compiled `rfernet` package when it is installed and falls
+back to `cryptography.fernet` otherwise. Both paths expose the cryptography
+API: bytes keys, `encrypt(bytes) -> bytes`, `decrypt(bytes) -> bytes`, and
+`InvalidToken` on a bad token or key.
+
+`RawFernet` produces the same token layout without the base64 wrapping, for
+binary (application/octet-stream) transports.
+
+`get_fernet` / `get_raw_fernet` return instances cached per key, so the key is
+decoded and validated once per process rather than once per caller.
+"""
+import base64
+import os
+import time
+from functools import lru_cache
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.fernet import InvalidToken
+from cryptography.hazmat.primitives import hashes, padding
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from cryptography.hazmat.primitives.hmac import HMAC
+
+_VERSION = b"\x80"
+_MAX_CLOCK_SKEW = 60
+# version (1) + timestamp (8) + IV (16) + one AES block (16) + HMAC (32)
+_MIN_RAW_TOKEN_LENGTH = 73
+
+try:
+    import rfernet
+except ImportError:
+    rfernet = None
+
+if rfernet is None:
+    from cryptography.fernet import Fernet
+else:
+    class Fernet:
+        """Adapts rfernet's str-based interface to cryptography's bytes-based one."""
+
+        def __init__(self, key):
+            if isinstance(key, bytes):
+                key = key.decode('ascii')
+            self._fernet = rfernet.Fernet(key)
+
+        @staticmethod
+        def generate_key():
+            return rfernet.Fernet.generate_new_key().encode('ascii')
+
+        def encrypt(self, data):
+            return self._fernet.encrypt(data).encode('ascii')
+
+        def decrypt(self, token, ttl=None):
+            if isinstance(token, bytes):
+                token = token.decode('ascii')
+            try:
+                if ttl is None:
+                    return self._fernet.decrypt(token)
+                return self._fernet.decrypt_with_ttl(token, ttl)
+            except (rfernet.DecryptionError, ValueError) as e:
+                raise InvalidToken from e
+
+
+class RawFernet:
+    """
+    Fernet (AES-128-CBC + HMAC-SHA256) over raw bytes.
+
+    Tokens are version || timestamp || IV || ciphertext || HMAC, exactly what
+    `base64.urlsafe_b64decode(Fernet(key).encrypt(data))` would give, so the two
+    forms convert into each other with a single base64 step.
+    """
+
+    def __init__(self, key):
+        key = base64.urlsafe_b64decode(key)
+        if len(key) != 32:
+            raise ValueError("Fernet key must be 32 url-safe base64-encoded bytes.")
+        self._signing_key = key[:16]
+        self._encryption_key = key[16:]
+
+    def _sign(self, data):
+        h = HMAC(self._signing_key, hashes.SHA256())
+        h.update(data)
+        return h
+
+    def encrypt(self, data):
+        iv = os.urandom(16)
+        padder = padding.PKCS7(algorithms.AES.block_size).padder()
+        padded = padder.update(data) + padder.finalize()
+        encryptor = Cipher(algorithms.AES(self._encryption_key), modes.CBC(iv)).encryptor()
+        ciphertext = encryptor.update(padded) + encryptor.finalize()
+        basic = _VERSION + int(time.time()).to_bytes(8, "big") + iv + ciphertext
+        return basic + self._sign(basic).finalize()
+
+    def decrypt(self, token, ttl=None):
+        if len(token) < _MIN_RAW_TOKEN_LENGTH or token[:1] != _VERSION:
+            raise InvalidToken
+        timestamp = int.from_bytes(token[1:9], "big")
+        now = int(time.time())
+        if ttl is not None and timestamp + ttl < now:
+            raise InvalidToken
+        if now + _MAX_CLOCK_SKEW < timestamp:
+            raise InvalidToken
+        try:
+            self._sign(token[:-32]).verify(token[-32:])
+        except InvalidSignature:
+            raise InvalidToken
+        iv = token[9:25]
+        decryptor = Cipher(algorithms.AES(self._encryption_key), modes.CBC(iv)).decryptor()
+        try:
+            padded = decryptor.update(token[25:-32]) + decryptor.finalize()
+            unpadder = padding.PKCS7(algorithms.AES.block_size).unpadder()
+            return unpadder.update(padded) + unpadder.finalize()
+        except ValueError:
+            raise InvalidToken
+
+
+@lru_cache(maxsize=4)
+def get_fernet(key: bytes) -> Fernet:
+    return Fernet(key)
+
+
+@lru_cache(maxsize=4)
+def get_raw_fernet(key: bytes) -> RawFernet:
+    return RawFernet(key)
@@ -2,34 +2,105 @@ from flask import Flask, request, jsonify, send_from_directory
 from flask_cors import CORS
 import hmac
 import hashlib
-import uuid
+import secrets
 import json
+import orjson
 import time
-from datetime import datetime, timezone, timedelta
 import os
-import sqlite3
 import base64
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from cryptography.fernet import Fernet
+from _fernet import RawFernet
 import shutil
-from functools import wraps
+from functools import cache, wraps
+from contextlib import contextmanager
+from collections import OrderedDict
 import math
+import logging
+import queue
+import threading
+import atexit
 import jwt
 
+# Prefer pysqlite3 (pysqlite3-binary), which bundles a current SQLite amalgamation, over
+# whatever SQLite the Python build links. The API is identical.
+try:
+    from pysqlite3 import dbapi2 as sqlite3
+except ImportError:
+    import sqlite3
+
+# Optional accelerators for gyroid scoring on large graphs. When they are not
+# installed, the scoring falls back to the single SQL statement in SQLite.
+try:
+    import numpy as np
+except ImportError:
+    np = None
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+
+# Runtime diagnostics go through this logger. Messages use lazy %-formatting so
+# nothing is stringified unless the level is enabled.
+logger=logging.getLogger("butterfly")
+
+# --- Timestamp Helper ---
+# The formatted "seconds" prefix is cached, so repeated calls within the same
+# second only pay for the microsecond suffix.
+_utc_second_prefix=(None, "")
+
+
+def _utcnow_iso() -> str:
+    """Returns the current UTC time as an ISO 8601 string (e.g. 2024-01-01T12:00:00.000000+00:00)."""
+    global _utc_second_prefix
+    seconds, nanoseconds=divmod(time.time_ns(), 1_000_000_000)
+    cached_second, prefix=_utc_second_prefix
+    if cached_second != seconds:
+        prefix=time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))
+        _utc_second_prefix=(seconds, prefix)
+    return f"{prefix}.{nanoseconds // 1000:06d}+00:00"
+
+
 # --- DBManager: Abstracting Database Operations ---
 
 
 class DBManager:
+    # Size of sqlite3's per-connection prepared-statement cache (the stdlib default is 128).
+    STATEMENT_CACHE_SIZE=256
+    # Applied to every new connection. WAL lets readers run alongside the writer, NORMAL sync
+    # is durable across application crashes in WAL mode, and the mmap window and 64 MiB page
+    # cache let hot pages be served without read(2) calls.
+    CONNECTION_PRAGMAS=(
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA mmap_size=268435456",
+        "PRAGMA cache_size=-65536",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA busy_timeout=5000",
+    )
+
     def __init__(self, db_config: dict):
         self.db_type = db_config.get('type', 'sqlite')
         self.db_path = db_config.get('path', 'butterfly_local.db')
         self.conn = None
+        # Per-thread nesting depth of deferred_commit() blocks.
+        self._local = threading.local()
+        # All threads share one connection, so a transaction is the connection's, not the
+        # thread's: another thread's commit() or rollback() would end it. Held for the whole
+        # of an outermost deferred_commit() block and by a plain commit(), so each block's
+        # writes commit or roll back on their own.
+        self._transaction_lock = threading.RLock()
         self._connect()
 
     def _connect(self):
         if self.db_type == 'sqlite':
-            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn = sqlite3.connect(
+                self.db_path, check_same_thread=False, cached_statements=self.STATEMENT_CACHE_SIZE)
             self.conn.row_factory = sqlite3.Row  # Allows accessing columns by name
+            for pragma in self.CONNECTION_PRAGMAS:
+                self.conn.execute(pragma)
         else:
             raise ValueError(f"Unsupported database type: {self.db_type}")
 
@@ -41,8 +112,39 @@ class DBManager:
         return cursor
 
     def commit(self):
-        if self.conn:
-            self.conn.commit()
+        # Inside deferred_commit() the commit is made once, when the outermost block exits.
+        if self.conn and not self.in_deferred_commit():
+            with self._transaction_lock:
+                self.conn.commit()
+
+    def in_deferred_commit(self) -> bool:
+        """True while the calling thread is inside a deferred_commit() block."""
+        return getattr(self._local, 'depth', 0) > 0
+
+    @contextmanager
+    def deferred_commit(self):
+        """
+        Folds every commit() issued by this thread inside the block into a single commit at
+        the end of the outermost block, so one request costs one transaction. Blocks nest.
+        Like `with conn:`, the outermost block rolls back instead if an exception escapes it.
+        Outermost blocks on different threads run one at a time.
+        """
+        depth = getattr(self._local, 'depth', 0)
+        if depth == 0:
+            self._transaction_lock.acquire()
+        self._local.depth = depth + 1
+        try:
+            yield
+            if depth == 0 and self.conn:
+                self.conn.commit()
+        except BaseException:
+            if depth == 0 and self.conn:
+                self.conn.rollback()
+            raise
+        finally:
+            self._local.depth = depth
+            if depth == 0:
+                self._transaction_lock.release()
 
     def close(self):
         if self.conn:
@@ -67,35 +169,93 @@ class EncryptionModule:
         """
         key = os.environ.get('BUTTERFLY_ENCRYPTION_KEY')
         if not key:
-            print(
-                "[!] WARNING: BUTTERFLY_ENCRYPTION_KEY environment variable not set. Generating a temporary key.")
-            print(
-                "[!] This is INSECURE for production. A new key will be generated on each restart.")
+            logger.warning(
+                "BUTTERFLY_ENCRYPTION_KEY environment variable not set. Generating a temporary key.")
+            logger.warning(
+                "This is INSECURE for production. A new key will be generated on each restart.")
             key = Fernet.generate_key()
 
         # The key must be URL-safe base64-encoded.
-        self.fernet = Fernet(key.encode())
+        if isinstance(key, str):
+            key = key.encode()
+        self.fernet = Fernet(key)
+        # Same key and token layout, minus base64, for application/octet-stream bodies.
+        self.raw_fernet = RawFernet(key)
 
     def encrypt(self, data: dict) -> str:
         """Encrypts a dictionary into a secure message."""
-        json_string = json.dumps(data)
-        encrypted_message = self.fernet.encrypt(json_string.encode('utf-8'))
+        # orjson serializes straight to bytes, so no separate utf-8 encode step is needed.
+        encrypted_message = self.fernet.encrypt(orjson.dumps(data))
         return encrypted_message.decode('utf-8')
 
-    def decrypt(self, encrypted_str: str) -> dict:
-        """Decrypts a secure message back into a dictionary."""
-        decrypted_message = self.fernet.decrypt(encrypted_str.encode('utf-8'))
-        return json.loads(decrypted_message.decode('utf-8'))
+    def decrypt(self, encrypted_message: str | bytes) -> dict:
+        """Decrypts a secure message (str, or the raw request bytes) back into a dictionary."""
+        # Fernet accepts both str and bytes tokens, so request bodies need no decode step.
+        decrypted_message = self.fernet.decrypt(encrypted_message)
+        return orjson.loads(decrypted_message)
+
+    def encrypt_raw(self, data: dict) -> bytes:
+        """Encrypts a dictionary into a raw (non-base64) Fernet token."""
+        return self.raw_fernet.encrypt(orjson.dumps(data))
+
+    def decrypt_raw(self, token: bytes) -> dict:
+        """Decrypts a raw (non-base64) Fernet token back into a dictionary."""
+        return orjson.loads(self.raw_fernet.decrypt(token))
 
 
 # --- AuditModule: Lightweight Local Database Logging ---
 
+# `id` is an explicit INTEGER PRIMARY KEY, i.e. the rowid under a name VACUUM must preserve.
+# The R*Tree and full-text indexes are keyed on it.
+_POINTERS_TABLE_DDL='''
+    CREATE TABLE IF NOT EXISTS {name}
+    (id INTEGER PRIMARY KEY,
+     address TEXT NOT NULL UNIQUE, -- This is the resource_id for an SRL
+     description TEXT,
+     data_reference TEXT NOT NULL UNIQUE,
+     tags TEXT,
+     connection_id TEXT,
+     credential_pointer_address TEXT, -- Optional: points to a pointer holding encrypted credentials
+     x REAL DEFAULT 0.0,
+     y REAL DEFAULT 0.0,
+     z INTEGER DEFAULT 0,
+     created_at TEXT NOT NULL,
+     last_modified TEXT NOT NULL)
+'''
+# A pointer's `tags` JSON if it is an array, else an empty array. json_type() rejects
+# malformed JSON, so validity is checked first; CASE only evaluates the branch it takes.
+_TAG_ARRAY="(CASE WHEN NOT json_valid({column}) THEN '[]' WHEN json_type({column}) = 'array' THEN {column} ELSE '[]' END)"
+_POINTERS_DATA_COLUMNS="address, description, data_reference, tags, connection_id, credential_pointer_address, x, y, z, created_at, last_modified"
+
 class AuditModule:
+    # Audit records are queued and written by a background thread in batches of up to
+    # AUDIT_BATCH_SIZE rows, or whatever arrived within AUDIT_FLUSH_SECONDS, so request
+    # handlers never wait on an audit INSERT. A batch that fails (typically because a request
+    # holds the write lock past busy_timeout) is retried with backoff rather than dropped.
+    AUDIT_QUEUE_SIZE=10000
+    AUDIT_BATCH_SIZE=100
+    AUDIT_FLUSH_SECONDS=0.1
+    AUDIT_RETRY_MAX_SECONDS=2.0
+    # How long interpreter shutdown, or close(), waits for queued records before giving up on them.
+    AUDIT_EXIT_TIMEOUT_SECONDS=10.0
+    # Queued by close() behind any pending records; the writer exits when it reaches it.
+    _STOP_WRITER=object()
+
     def __init__(self, db_config: dict):
         self.db_manager = DBManager(db_config)
         self._initialize_schema()
-        print(
-            f"[*] AuditModule initialized. Logging to '{self.db_manager.db_path}'.")
+        self._audit_queue=queue.Queue(maxsize=self.AUDIT_QUEUE_SIZE)
+        self._audit_writer=None
+        # An in-memory database is private to its connection, so the writer thread could not
+        # see it; those instances keep writing audit rows synchronously.
+        if self.db_manager.db_path != ':memory:':
+            self._writer_db_manager=DBManager(db_config)
+            self._audit_writer=threading.Thread(
+                target=self._drain_audit_queue, name="butterfly-audit-writer", daemon=True)
+            self._audit_writer.start()
+            atexit.register(self.flush, self.AUDIT_EXIT_TIMEOUT_SECONDS)
+        logger.info(
+            "AuditModule initialized. Logging to '%s'.", self.db_manager.db_path)
 
     def _initialize_schema(self):
         self.db_manager.execute('''
@@ -121,20 +281,8 @@ class AuditModule:
              domain_id TEXT NOT NULL,
              FOREIGN KEY(domain_id) REFERENCES domains(id))
         ''')
-        self.db_manager.execute('''
-            CREATE TABLE IF NOT EXISTS pointers
-            (address TEXT PRIMARY KEY, -- This is the resource_id for an SRL
-             description TEXT,
-             data_reference TEXT NOT NULL UNIQUE,
-             tags TEXT,
-             connection_id TEXT,
-             credential_pointer_address TEXT, -- Optional: points to a pointer holding encrypted credentials
-             x REAL DEFAULT 0.0,
-             y REAL DEFAULT 0.0,
-             z INTEGER DEFAULT 0,
-             created_at TEXT NOT NULL,
-             last_modified TEXT NOT NULL)
-        ''')
+        self.db_manager.execute(_POINTERS_TABLE_DDL.format(name='pointers'))
+        rebuilt_pointers=self._migrate_pointers_integer_key()
         self.db_manager.execute('''
             CREATE TABLE IF NOT EXISTS relationships
             (pointer_a_address TEXT NOT NULL,
@@ -145,6 +293,169 @@ class AuditModule:
              FOREIGN KEY(pointer_a_address) REFERENCES pointers(address) ON DELETE CASCADE,
              FOREIGN KEY(pointer_b_address) REFERENCES pointers(address) ON DELETE CASCADE)
         ''')
+        # Covering indexes for the by-type listing (filter, range, then projected columns) and
+        # for the distinct relationship types of one pointer, so neither needs a sort or table lookup.
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_relationships_type ON relationships(relationship, pointer_a_address, pointer_b_address, weight)")
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_relationships_a_type ON relationships(pointer_a_address, relationship)")
+        # Keyset pagination orders every list by (created_at, address).
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pointers_created_address ON pointers(created_at, address)")
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pointers_connection_created ON pointers(connection_id, created_at, address)")
+        # Normalized (pointer, tag) pairs mirroring the JSON `tags` column. Triggers keep it in
+        # sync, so tag lookups are index probes instead of JSON decoding every pointer row.
+        self.db_manager.execute('''
+            CREATE TABLE IF NOT EXISTS pointer_tags
+            (pointer_address TEXT NOT NULL,
+             tag TEXT NOT NULL,
+             PRIMARY KEY (pointer_address, tag))
+        ''')
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_pointer_tags_tag ON pointer_tags(tag)")
+        # Only a JSON array of tags is indexed; a scalar or object `tags` value has no tags.
+        # Earlier versions indexed any valid JSON, so the insert/update triggers are replaced
+        # and stray rows from non-array values are purged.
+        for trigger in ('pointers_tags_ai', 'pointers_tags_au'):
+            self.db_manager.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        self.db_manager.execute(f'''
+            CREATE TRIGGER pointers_tags_ai AFTER INSERT ON pointers
+            BEGIN
+                INSERT OR IGNORE INTO pointer_tags (pointer_address, tag)
+                SELECT NEW.address, value FROM json_each({_TAG_ARRAY.format(column='NEW.tags')})
+                WHERE value IS NOT NULL;
+            END
+        ''')
+        self.db_manager.execute(f'''
+            CREATE TRIGGER pointers_tags_au AFTER UPDATE OF tags ON pointers
+            BEGIN
+                DELETE FROM pointer_tags WHERE pointer_address = OLD.address;
+                INSERT OR IGNORE INTO pointer_tags (pointer_address, tag)
+                SELECT NEW.address, value FROM json_each({_TAG_ARRAY.format(column='NEW.tags')})
+                WHERE value IS NOT NULL;
+            END
+        ''')
+        self.db_manager.execute(f'''
+            DELETE FROM pointer_tags WHERE pointer_address IN (
+                SELECT address FROM pointers WHERE {_TAG_ARRAY.format(column='tags')} = '[]')
+        ''')
+        self.db_manager.execute('''
+            CREATE TRIGGER IF NOT EXISTS pointers_tags_ad AFTER DELETE ON pointers
+            BEGIN
+                DELETE FROM pointer_tags WHERE pointer_address = OLD.address;
+            END
+        ''')
+        # Index the tags of any pointers that were created before pointer_tags existed.
+        self.db_manager.execute(f'''
+            INSERT OR IGNORE INTO pointer_tags (pointer_address, tag)
+            SELECT p.address, je.value
+            FROM pointers p, json_each({_TAG_ARRAY.format(column='p.tags')}) je
+            WHERE je.value IS NOT NULL
+            AND p.address NOT IN (SELECT pointer_address FROM pointer_tags)
+        ''')
+        # A single-row generation counter bumped by any insert, delete or coordinate update
+        # on pointers, so the cached NumPy coordinate arrays know exactly when they are stale.
+        self.db_manager.execute('''
+            CREATE TABLE IF NOT EXISTS pointer_coordinates_version
+            (id INTEGER PRIMARY KEY CHECK (id = 0),
+             generation INTEGER NOT NULL)
+        ''')
+        self.db_manager.execute(
+            "INSERT OR IGNORE INTO pointer_coordinates_version (id, generation) VALUES (0, 0)")
+        for trigger, event in (('ai', 'INSERT'), ('ad', 'DELETE'), ('au', 'UPDATE OF address, x, y, z')):
+            self.db_manager.execute(f'''
+                CREATE TRIGGER IF NOT EXISTS pointers_coordinates_{trigger} AFTER {event} ON pointers
+                BEGIN
+                    UPDATE pointer_coordinates_version SET generation = generation + 1 WHERE id = 0;
+                END
+            ''')
+        # Spatial index over pointer coordinates, keyed by the pointers id. Proximity
+        # searches probe this R*Tree instead of scanning every pointer. Some SQLite builds
+        # ship without the rtree module; proximity search then falls back to NumPy.
+        try:
+            self.db_manager.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS pointers_rtree
+                USING rtree(id, minX, maxX, minY, maxY, minZ, maxZ)
+            ''')
+            if rebuilt_pointers:
+                # Re-index from scratch rather than trust entries keyed on the old implicit rowid.
+                self.db_manager.execute("DELETE FROM pointers_rtree")
+            # Triggers keep the R*Tree in step with every write to the pointers table.
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_rtree_ai AFTER INSERT ON pointers
+                BEGIN
+                    INSERT INTO pointers_rtree (id, minX, maxX, minY, maxY, minZ, maxZ)
+                    VALUES (NEW.id, NEW.x, NEW.x, NEW.y, NEW.y, NEW.z, NEW.z);
+                END
+            ''')
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_rtree_au AFTER UPDATE OF x, y, z ON pointers
+                BEGIN
+                    UPDATE pointers_rtree SET minX = NEW.x, maxX = NEW.x, minY = NEW.y, maxY = NEW.y, minZ = NEW.z, maxZ = NEW.z
+                    WHERE id = NEW.id;
+                END
+            ''')
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_rtree_ad AFTER DELETE ON pointers
+                BEGIN
+                    DELETE FROM pointers_rtree WHERE id = OLD.id;
+                END
+            ''')
+            # Index any pointers that were created before the R*Tree existed.
+            self.db_manager.execute('''
+                INSERT INTO pointers_rtree (id, minX, maxX, minY, maxY, minZ, maxZ)
+                SELECT id, x, x, y, y, z, z FROM pointers
+                WHERE id NOT IN (SELECT id FROM pointers_rtree)
+            ''')
+            self.has_rtree=True
+        except sqlite3.OperationalError as e:
+            logger.warning("R*Tree unavailable, proximity search will scan coordinates: %s", e)
+            self.has_rtree=False
+        # Trigram full-text index over descriptions. The trigram tokenizer lets SQLite answer
+        # the same case-insensitive `LIKE '%term%'` the handler has always used from the index
+        # rather than a full-table scan. It is external-content, so no text is stored twice.
+        try:
+            fts_row=self.db_manager.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'pointers_fts'").fetchone()
+            if fts_row and "content_rowid='id'" not in fts_row[0]:
+                # Created against the implicit rowid by an earlier version; recreate it keyed on id.
+                self.db_manager.execute("DROP TABLE pointers_fts")
+                for trigger in ('pointers_fts_ai', 'pointers_fts_au', 'pointers_fts_ad'):
+                    self.db_manager.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+                fts_row=None
+            self.db_manager.execute('''
+                CREATE VIRTUAL TABLE IF NOT EXISTS pointers_fts
+                USING fts5(description, content='pointers', content_rowid='id', tokenize='trigram')
+            ''')
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_fts_ai AFTER INSERT ON pointers
+                BEGIN
+                    INSERT INTO pointers_fts (rowid, description) VALUES (NEW.id, NEW.description);
+                END
+            ''')
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_fts_au AFTER UPDATE OF description ON pointers
+                BEGIN
+                    INSERT INTO pointers_fts (pointers_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+                    INSERT INTO pointers_fts (rowid, description) VALUES (NEW.id, NEW.description);
+                END
+            ''')
+            self.db_manager.execute('''
+                CREATE TRIGGER IF NOT EXISTS pointers_fts_ad AFTER DELETE ON pointers
+                BEGIN
+                    INSERT INTO pointers_fts (pointers_fts, rowid, description) VALUES ('delete', OLD.id, OLD.description);
+                END
+            ''')
+            if not fts_row or rebuilt_pointers:
+                # Index any pointers that were created before the FTS table existed, or
+                # re-index them if the pointers table was just rebuilt.
+                self.db_manager.execute(
+                    "INSERT INTO pointers_fts (pointers_fts) VALUES ('rebuild')")
+            self.has_fts=True
+        except sqlite3.OperationalError as e:
+            logger.warning("FTS5 trigram index unavailable, description search will scan: %s", e)
+            self.has_fts=False
         self.db_manager.execute('''
             CREATE TABLE IF NOT EXISTS mailing_list
             (id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -172,17 +483,159 @@ class AuditModule:
              FOREIGN KEY(source_domain_id) REFERENCES domains(id) ON DELETE CASCADE,
              FOREIGN KEY(target_domain_id) REFERENCES domains(id) ON DELETE CASCADE)
         ''')
+        # Secondary indexes for the per-domain listings and the federation checks, which look
+        # the pair up from either side.
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_connections_domain ON connections(domain_id)")
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_access_keys_domain ON access_keys(domain_id)")
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_federations_source ON federations(source_domain_id, target_domain_id)")
+        self.db_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_federations_target ON federations(target_domain_id, source_domain_id)")
+        self.db_manager.commit()
+
+    def _migrate_pointers_integer_key(self) -> bool:
+        """
+        Databases created before pointers had an `id` column key it on the TEXT address
+        alone, so the only integer key is the implicit rowid, which VACUUM is free to
+        renumber. Rebuilds such a table with an INTEGER PRIMARY KEY that carries the current
+        rowids over. Returns True if the table was rebuilt.
+        """
+        columns=[row[1] for row in self.db_manager.execute("PRAGMA table_info(pointers)")]
+        if 'id' in columns:
+            return False
+        logger.info("Migrating the pointers table to an INTEGER PRIMARY KEY.")
+        self.db_manager.execute("DROP TABLE IF EXISTS pointers_migrated")
+        self.db_manager.execute(_POINTERS_TABLE_DDL.format(name='pointers_migrated'))
+        # Dropping the old table also drops its triggers and indexes; the rest of schema
+        # initialization recreates them against the new table.
+        self.db_manager.execute(f'''
+            INSERT INTO pointers_migrated (id, {_POINTERS_DATA_COLUMNS})
+            SELECT rowid, {_POINTERS_DATA_COLUMNS} FROM pointers
+        ''')
+        self.db_manager.execute("DROP TABLE pointers")
+        self.db_manager.execute("ALTER TABLE pointers_migrated RENAME TO pointers")
         self.db_manager.commit()
+        return True
 
-    def log(self, action: str, details: str = ""):
+    def log(self, action: str, details: str = "", durable: bool = False):
+        """
+        Records an audit entry. By default it is queued for the background writer and lands
+        within AUDIT_FLUSH_SECONDS, so read-only actions never open a write transaction for
+        their audit trail; pass durable=True to insert it on the caller's connection, to be
+        committed (or rolled back) with the caller's transaction.
+        """
         # Use UTC for consistency
-        timestamp = datetime.now(timezone.utc).isoformat()
+        timestamp = _utcnow_iso()
+        if self._audit_writer is not None and not durable:
+            try:
+                self._audit_queue.put_nowait((timestamp, action, details))
+                return
+            except queue.Full:
+                # The writer is falling behind; degrade to a synchronous insert rather than drop it.
+                pass
         self.db_manager.execute(
             "INSERT INTO audit_log (timestamp, action, details) VALUES (?, ?, ?)", (timestamp, action, details))
 
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Blocks until every queued audit entry has been written, or `timeout` seconds pass.
+        Returns False on timeout.
+
+        Called inside a deferred_commit() block, the caller's open transaction would keep the
+        writer thread locked out, so nothing waits on it: entries still in the queue are
+        inserted on the caller's connection instead. A batch the writer had already taken
+        lands once the caller's transaction commits.
+        """
+        if self._audit_writer is None:
+            return True
+        if self.db_manager.in_deferred_commit():
+            pending=[]
+            while True:
+                try:
+                    pending.append(self._audit_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if pending:
+                self.db_manager.conn.executemany(
+                    "INSERT INTO audit_log (timestamp, action, details) VALUES (?, ?, ?)", pending)
+                for _ in pending:
+                    self._audit_queue.task_done()
+            return True
+        with self._audit_queue.all_tasks_done:
+            return self._audit_queue.all_tasks_done.wait_for(
+                lambda: not self._audit_queue.unfinished_tasks, timeout)
+
+    def _drain_audit_queue(self):
+        stopping=False
+        while not stopping:
+            entry=self._audit_queue.get()
+            if entry is self._STOP_WRITER:
+                self._audit_queue.task_done()
+                return
+            batch=[entry]
+            deadline=time.monotonic() + self.AUDIT_FLUSH_SECONDS
+            while len(batch) < self.AUDIT_BATCH_SIZE:
+                remaining=deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry=self._audit_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is self._STOP_WRITER:
+                    self._audit_queue.task_done()
+                    stopping=True
+                    break
+                batch.append(entry)
+            delay=self.AUDIT_FLUSH_SECONDS
+            while True:
+                try:
+                    # One transaction per batch.
+                    with self._writer_db_manager.conn:
+                        self._writer_db_manager.conn.executemany(
+                            "INSERT INTO audit_log (timestamp, action, details) VALUES (?, ?, ?)", batch)
+                    break
+                except sqlite3.Error as e:
+                    logger.warning("Failed to write %d audit records, retrying in %.1fs: %s", len(batch), delay, e)
+                    time.sleep(delay)
+                    delay=min(delay * 2, self.AUDIT_RETRY_MAX_SECONDS)
+            for _ in batch:
+                self._audit_queue.task_done()
+
     def commit(self):
         self.db_manager.commit()
 
+    def close(self):
+        """
+        Writes out the queued audit entries, stops the writer thread and closes both
+        connections. Safe to call more than once.
+        """
+        writer=self._audit_writer
+        if writer is not None:
+            self._audit_writer=None  # Anything logged from here on is written synchronously.
+            atexit.unregister(self.flush)
+            self._audit_queue.put(self._STOP_WRITER)
+            writer.join(self.AUDIT_EXIT_TIMEOUT_SECONDS)
+            if writer.is_alive():
+                logger.warning("Audit writer did not stop within %.0fs; leaving it to exit with the process.",
+                               self.AUDIT_EXIT_TIMEOUT_SECONDS)
+            else:
+                self._writer_db_manager.close()
+                # Entries a racing log() queued behind the stop marker.
+                leftover=[]
+                while True:
+                    try:
+                        leftover.append(self._audit_queue.get_nowait())
+                    except queue.Empty:
+                        break
+                if leftover:
+                    self.db_manager.conn.executemany(
+                        "INSERT INTO audit_log (timestamp, action, details) VALUES (?, ?, ?)", leftover)
+                    self.db_manager.commit()
+        self.db_manager.close()
+
 # --- GyroidStructureModule Logic (Integrated) ---
 # Helper function for gyroid calculation
 def _hash_to_vector3(s: str) -> tuple[float, float, float]:
@@ -201,6 +654,33 @@ def _calculate_gyroid_score(dx: float, dy: float, dz: float) -> float:
     """Calculates a gyroid score based on delta coordinates."""
     return abs(math.sin(dx) * math.cos(dy) + math.sin(dy) * math.cos(dz) + math.sin(dz) * math.cos(dx))
 
+
+def _gyroid_scores_batch(coords, ref):
+    """
+    Vectorized form of `_calculate_gyroid_score` for many pairs at once.
+    `coords` is an (N, 3) array and `ref` a length-3 point; returns the N scores.
+    """
+    dx=ref[0] - coords[:, 0]
+    dy=ref[1] - coords[:, 1]
+    dz=ref[2] - coords[:, 2]
+    return np.abs(np.sin(dx) * np.cos(dy) + np.sin(dy) * np.cos(dz) + np.sin(dz) * np.cos(dx))
+
+
+# Graphs smaller than this are scored inside SQLite; batch scoring only pays off at scale.
+GYROID_BATCH_MIN_POINTERS=1000
+
+if njit is not None:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _gyroid_scores(x0, y0, z0, xs, ys, zs, out):
+        """Fills `out` with the gyroid score of (x0, y0, z0) against every coordinate, in one fused pass."""
+        for i in prange(xs.shape[0]):
+            dx = x0 - xs[i]
+            dy = y0 - ys[i]
+            dz = z0 - zs[i]
+            out[i] = abs(math.sin(dx) * math.cos(dy) + math.sin(dy) * math.cos(dz) + math.sin(dz) * math.cos(dx))
+else:
+    _gyroid_scores = None
+
 # --- CycleModule: Manager of the Fibonacci Renewal Cycle (Integrated) ---
 
 
@@ -213,10 +693,18 @@ class CycleModule:
     # Fibonacci-like sequence for optimal growth
     _OPTIMAL_SEQUENCE=[1, 2, 3, 5, 8, 13, 21]
 
+    def __init__(self):
+        # operation_id -> current step of that operation's cycle
+        self._active_cycles={}
+
     def start_cycle(self, operation_id: str):
         """Starts a new growth cycle for a given operation."""
         self._active_cycles[operation_id]=self.RESET_STATE
 
+    def end_cycle(self, operation_id: str):
+        """Forgets a finished operation's cycle."""
+        self._active_cycles.pop(operation_id, None)
+
     def _get_next_optimal(self, current_index: int) -> int:
         """Finds the next step in the optimal Fibonacci-like sequence."""
         for num in self._OPTIMAL_SEQUENCE:
@@ -224,6 +712,11 @@ class CycleModule:
                 return num
         return self.MAX_CYCLE_LIMIT
 
+    def advance_cycle(self, operation_id: str, is_optimal: bool=False) -> dict:
+        """
+        Advances an operation's cycle by one step, or to the next optimal step when
+        `is_optimal` is set, resetting it once the cycle limit is reached.
+        """
         current_index=self._active_cycles[operation_id]
         next_index=self._get_next_optimal(
             current_index) if is_optimal else current_index + 1
@@ -249,6 +742,318 @@ GENESIS_POINTER_ADDRESS="ptr_genesis_0000"
 INTERNAL_DATA_DB_PATH="butterfly_internal_data.db"
 
 
+# --- Hot-Path SQL ---
+# Statements issued on every data access are kept as module-level constants. The sqlite3
+# statement cache is keyed by the exact SQL text, so a stable string is compiled once per
+# connection and then reused, rather than being re-parsed and re-planned on each call.
+# Whether the requesting domain has an accepted federation with the domain of connection `c`,
+# in either direction. Params: requesting_domain_id, requesting_domain_id.
+_FEDERATED_WITH_CONNECTION_DOMAIN="""EXISTS (
+        SELECT 1 FROM federations f
+        WHERE f.status = 'accepted'
+        AND ((f.source_domain_id = ? AND f.target_domain_id = c.domain_id)
+            OR (f.target_domain_id = ? AND f.source_domain_id = c.domain_id)))"""
+# The connection's domain and whether the requester is federated with it.
+# Params: requesting_domain_id, requesting_domain_id, connection_id.
+_SQL_CONNECTION_ACCESS=f"SELECT c.domain_id, {_FEDERATED_WITH_CONNECTION_DOMAIN} FROM connections c WHERE c.id = ?"
+# Everything an invocation needs in one round-trip, driven by the connection so a missing
+# connection yields no row.
+# Params: requesting_domain_id, requesting_domain_id, pointer_address, connection_id.
+_SQL_INVOCATION_CONTEXT=f"""
+    SELECT c.domain_id, p.connection_id, p.data_reference, p.credential_pointer_address, cp.data_reference,
+        {_FEDERATED_WITH_CONNECTION_DOMAIN}
+    FROM connections c
+    LEFT JOIN pointers p ON p.address = ?
+    LEFT JOIN pointers cp ON cp.address = p.credential_pointer_address
+    WHERE c.id = ?
+"""
+_SQL_POINTER_COORDS="SELECT x, y, z FROM pointers WHERE address = ?"
+_POINTER_COLUMNS="p.address, p.description, p.data_reference, p.tags, p.connection_id, p.x, p.y, p.z, p.created_at, p.last_modified"
+# Keyset page over (created_at, address), served by idx_pointers_created_address. Params: after_created_at, after_address, limit.
+_KEYSET_PAGE=" AND (p.created_at, p.address) > (?, ?) ORDER BY p.created_at, p.address LIMIT ?"
+_SQL_POINTER_BY_ADDRESS=f"SELECT {_POINTER_COLUMNS} FROM pointers p WHERE p.address = ?"
+_SQL_POINTER_NEIGHBORS="SELECT pointer_b_address, relationship, weight FROM relationships WHERE pointer_a_address = ?"
+_SQL_POINTERS_FOR_CONNECTION=f"SELECT {_POINTER_COLUMNS} FROM pointers p WHERE p.connection_id = ?" + _KEYSET_PAGE
+_PROXIMITY_BRIEF_COLUMNS="p.address, p.description"
+_PROXIMITY_DISTANCE="((p.x - ?) * (p.x - ?)) + ((p.y - ?) * (p.y - ?)) + ((p.z - ?) * (p.z - ?)) <= ?"
+_PROXIMITY_RTREE="""
+    SELECT {columns}
+    FROM pointers_rtree r JOIN pointers p ON p.id = r.id
+    WHERE r.maxX >= ? AND r.minX <= ?
+    AND r.maxY >= ? AND r.minY <= ?
+    AND r.maxZ >= ? AND r.minZ <= ?
+    AND {distance}
+    AND p.address != ?
+"""
+_PROXIMITY_SCAN="SELECT {columns} FROM pointers p WHERE {distance} AND p.address != ?"
+_PROXIMITY_BY_ADDRESS="SELECT {columns} FROM pointers p WHERE p.address IN (SELECT value FROM json_each(?))"
+_SQL_PROXIMITY=_PROXIMITY_RTREE.format(columns=_POINTER_COLUMNS, distance=_PROXIMITY_DISTANCE) + _KEYSET_PAGE
+_SQL_PROXIMITY_BRIEF=_PROXIMITY_RTREE.format(columns=_PROXIMITY_BRIEF_COLUMNS, distance=_PROXIMITY_DISTANCE)
+_SQL_PROXIMITY_SCAN=_PROXIMITY_SCAN.format(columns=_POINTER_COLUMNS, distance=_PROXIMITY_DISTANCE) + _KEYSET_PAGE
+_SQL_PROXIMITY_SCAN_BRIEF=_PROXIMITY_SCAN.format(columns=_PROXIMITY_BRIEF_COLUMNS, distance=_PROXIMITY_DISTANCE)
+_SQL_PROXIMITY_BY_ADDRESS=_PROXIMITY_BY_ADDRESS.format(columns=_POINTER_COLUMNS) + _KEYSET_PAGE
+_SQL_PROXIMITY_BY_ADDRESS_BRIEF=_PROXIMITY_BY_ADDRESS.format(columns=_PROXIMITY_BRIEF_COLUMNS)
+_SQL_POINTER_COORDINATE_VERSION="SELECT generation FROM pointer_coordinates_version WHERE id = 0"
+_SQL_ALL_POINTER_COORDINATES="SELECT address, x, y, z FROM pointers"
+# search_pointers tag filters. Each takes the tag list as one JSON array parameter, so the
+# SQL text is the same for any number of tags and stays in the statement cache. Inclusion
+# is driven from the tag index; exclusion is a primary-key probe per candidate.
+_TAG_FILTER_ANY="p.address IN (SELECT pointer_address FROM pointer_tags WHERE tag IN (SELECT value FROM json_each(?)))"
+_TAG_FILTER_ALL="""p.address IN (
+    SELECT pointer_address FROM pointer_tags WHERE tag IN (SELECT value FROM json_each(?))
+    GROUP BY pointer_address HAVING COUNT(DISTINCT tag) = (SELECT COUNT(DISTINCT value) FROM json_each(?)))"""
+_TAG_FILTER_EXCLUDE="NOT EXISTS (SELECT 1 FROM pointer_tags pt WHERE pt.pointer_address = p.address AND pt.tag IN (SELECT value FROM json_each(?)))"
+_SQL_POINTERS_BY_TAG="""
+    SELECT p.address, p.description, p.created_at
+    FROM pointer_tags t JOIN pointers p ON p.address = t.pointer_address
+    WHERE t.tag = ?
+"""
+_SQL_POINTER_SUMMARY="SELECT description, tags, created_at, last_modified, connection_id, x, y, z FROM pointers WHERE address = ?"
+_SQL_NEIGHBOR_COUNT="SELECT COUNT(*) FROM relationships WHERE pointer_a_address = ?"
+_SQL_GRAPH_STATS="""
+    SELECT (SELECT COUNT(*) FROM pointers),
+           (SELECT COUNT(*) FROM (
+                SELECT DISTINCT MIN(pointer_a_address, pointer_b_address), MAX(pointer_a_address, pointer_b_address)
+                FROM relationships))
+"""
+_GRAPH_DOT_BATCH=1000
+_SQL_GRAPH_DOT_NODES="SELECT address, description FROM pointers"
+# One edge per unordered pair. Links may be stored in one or both directions; the bare
+# columns come from the pair's first-inserted row because of the MIN(rowid) aggregate.
+_SQL_GRAPH_DOT_EDGES="""
+    SELECT pointer_a_address, pointer_b_address, relationship, weight, MIN(rowid)
+    FROM relationships
+    GROUP BY MIN(pointer_a_address, pointer_b_address), MAX(pointer_a_address, pointer_b_address)
+"""
+_SQL_ADMIN_OVERVIEW="""
+    SELECT d.id, d.name, d.created_at, c.id, c.name, c.description, c.allow_writes, c.status
+    FROM domains d LEFT JOIN connections c ON c.domain_id = d.id
+    WHERE d.id = ?
+    ORDER BY d.id, c.id
+"""
+
+
+# --- Outbound HTTP ---
+# One pooled, keep-alive session is shared by every proxied invocation, so repeated calls to
+# the same upstream host reuse the TCP+TLS connection instead of handshaking each time.
+_http_session=requests.Session()
+_http_adapter=HTTPAdapter(pool_connections=16, pool_maxsize=64,
+                          max_retries=Retry(total=2, backoff_factor=0.1))
+_http_session.mount("https://", _http_adapter)
+_http_session.mount("http://", _http_adapter)
+# (connect, read) timeouts in seconds for proxied upstream requests.
+HTTP_TIMEOUT=(2, 10)
+# Upper bound on a proxied response body. Larger bodies are rejected rather than buffered,
+# so one oversized upstream resource cannot balloon the worker's memory.
+MAX_FETCH_BYTES=16 << 20
+_FETCH_CHUNK_BYTES=48 * 1024
+
+
+def _read_capped_body(response, limit: int=MAX_FETCH_BYTES) -> bytes:
+    """Reads a streamed response body chunk by chunk, raising ValueError once it exceeds `limit` bytes."""
+    declared_length=response.headers.get('Content-Length')
+    if declared_length and declared_length.isdigit() and int(declared_length) > limit:
+        raise ValueError(f"Response body of {declared_length} bytes exceeds the {limit}-byte limit.")
+    body=bytearray()
+    for chunk in response.iter_content(chunk_size=_FETCH_CHUNK_BYTES):
+        body += chunk
+        if len(body) > limit:
+            raise ValueError(f"Response body exceeds the {limit}-byte limit.")
+    return bytes(body)
+
+
+def _pointer_from_row(row) -> dict:
+    """Builds the client-facing pointer dict from a row selected as _POINTER_COLUMNS."""
+    return {
+        "address": row[0], "description": row[1], "data_reference": row[2],
+        "tags": orjson.loads(row[3]), "connection_id": row[4],
+        "x": row[5], "y": row[6], "z": row[7],
+        "created_at": row[8], "last_modified": row[9]
+    }
+
+
+# --- TTL Cache ---
+
+
+class _TTLCache:
+    """
+    A small thread-safe cache with per-entry expiry and LRU eviction once `maxsize`
+    entries are held. Lookups, inserts and evictions are all O(1).
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize=maxsize
+        self.ttl=ttl
+        self._entries=OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock=threading.Lock()
+
+    def get(self, key, default=None):
+        now=time.monotonic()
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is None:
+                return default
+            if entry[0] <= now:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl: float=None):
+        expires_at=time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key]=(expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# --- Pagination ---
+# List handlers return bounded pages. The cursor is the (created_at, address) of the last
+# row served, base64-encoded JSON, so the next page is an index seek rather than an OFFSET
+# that re-walks every earlier row. No state is kept on the server.
+DEFAULT_PAGE_SIZE=50
+MAX_PAGE_SIZE=500
+# Sorts before any real (created_at, address), so the first page needs no special SQL.
+_FIRST_PAGE_KEY=("", "")
+
+
+def _encode_page_cursor(created_at: str, address: str) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps([created_at, address])).decode('ascii')
+
+
+def _read_page_request(query: dict) -> tuple:
+    """
+    Returns (page_size, after_key) from the query's 'page_size' and 'cursor'.
+    Raises ValueError if either is malformed.
+    """
+    try:
+        page_size=int(query.get("page_size") or DEFAULT_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("'page_size' must be an integer.")
+    page_size=max(1, min(page_size, MAX_PAGE_SIZE))
+    token=query.get("cursor")
+    if not token:
+        return page_size, _FIRST_PAGE_KEY
+    try:
+        created_at, address=orjson.loads(base64.urlsafe_b64decode(token))
+        return page_size, (str(created_at), str(address))
+    except (TypeError, ValueError, orjson.JSONDecodeError):
+        raise ValueError("'cursor' is not a valid page cursor.")
+
+
+def _split_page(rows: list, page_size: int) -> tuple:
+    """
+    Trims rows fetched with LIMIT page_size + 1 to one page and returns (rows, next_cursor),
+    where next_cursor is None on the last page. Rows use the _POINTER_COLUMNS order.
+    """
+    if len(rows) <= page_size:
+        return rows, None
+    rows=rows[:page_size]
+    last=rows[-1]
+    return rows, _encode_page_cursor(last[8], last[0])
+
+
+# --- Action Dispatcher ---
+# Maps each action name to the name of the PointerHelper method that handles it.
+# Built once at import time instead of per instance; `invoke` resolves the bound
+# method with getattr. This aligns with the principle of "flexibility by design".
+_ACTIONS: dict[str, str]={
+    "create_pointer": "_handle_create_pointer",
+    "get_pointer": "_handle_get_pointer",
+    "add_neighbor": "_handle_add_neighbor",
+    "get_neighbors": "_handle_get_neighbors",
+    "initiate_federation": "_handle_initiate_federation",
+    "accept_federation": "_handle_accept_federation",
+    "revoke_federation": "_handle_revoke_federation",
+    "get_federation_status": "_handle_get_federation_status",
+    "create_domain": "_handle_create_domain",
+    "generate_access_key": "_handle_generate_access_key",
+    "get_domain_details": "_handle_get_domain_details",
+    "revoke_access_key": "_handle_revoke_access_key",
+    "set_connection_status": "_handle_set_connection_status",
+    "create_connection": "_handle_create_connection",
+    "assign_pointer_to_connection": "_handle_assign_pointer_to_connection",
+    "invoke_through_connection": "_handle_invoke_through_connection",
+    "get_pointers_for_connection": "_handle_get_pointers_for_connection",
+    "search_pointers": "_handle_search_pointers",
+    "search_by_proximity": "_handle_search_by_proximity",
+    "get_graph_stats": "_handle_get_graph_stats",
+    "get_admin_overview": "_handle_get_admin_overview",
+    "get_graph_dot": "_handle_get_graph_dot",
+    "create_circuit": "_handle_create_circuit",
+    "get_pointer_summary": "_handle_get_pointer_summary",
+    "execute_creation_model": "_handle_execute_creation_model",
+    "clear_audit_log": "_handle_clear_audit_log",
+    "get_all_tags": "_handle_get_all_tags",
+    "get_unassigned_pointers": "_handle_get_unassigned_pointers",
+    "get_available_apis": "_handle_get_available_apis",
+    "find_pointers_by_tag": "_handle_find_pointers_by_tag",
+    "get_pointer_relationships": "_handle_get_pointer_relationships",
+    "get_isolated_pointers": "_handle_get_isolated_pointers",
+    "get_relationships_by_type": "_handle_get_relationships_by_type",
+    # Add other actions here...
+}
+
+
+# --- Predefined APIs ---
+# The out-of-the-box connection catalogue is static, so it is built once at import time.
+# Community Edition APIs: Freely available, no keys required.
+_COMMUNITY_APIS={
+    "news": {"data_reference": "https://www.reddit.com/.json", "description": "Free News Feed (Reddit)"},
+    "trivia": {"data_reference": "https://opentdb.com/api.php?amount=1", "description": "Trivia Questions (Open Trivia DB)"},
+    "knowledge": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=Albert%20Einstein&format=json", "description": "General Knowledge (Wikipedia API)"},
+    "history": {"data_reference": "http://numbersapi.com/random/date", "description": "Historical Date Facts (Numbers API)"},
+    "joke_ai": {"data_reference": "https://v2.jokeapi.dev/joke/Any?format=json", "description": "Lightweight Joke Generation AI"},
+    "advice_ai": {"data_reference": "https://api.adviceslip.com/advice", "description": "Lightweight Advice Generation AI"},
+    "gis": {"data_reference": "https://nominatim.openstreetmap.org/search?q=Eiffel+Tower&format=json", "description": "Geographic Information (Nominatim)"},
+    "city": {"data_reference": "https://api.teleport.org/api/cities/geonameid:5128581/", "description": "City Information (Teleport)"},
+    "country": {"data_reference": "https://restcountries.com/v3.1/name/united", "description": "Country Information (REST Countries)"},
+    "street": {"data_reference": "https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat=40.714224&lon=-73.961452", "description": "Street Name (Nominatim)"},
+    "landmarks": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=geosearch&gscoord=48.858|2.294&gsradius=10000&format=json", "description": "Earth Landmarks (Wikipedia GeoSearch)"},
+    "animals": {"data_reference": "https://zoo-animal-api.herokuapp.com/animals/rand", "description": "Animal and Wildlife Database"},
+    "cats": {"data_reference": "https://api.thecatapi.com/v1/breeds/abys", "description": "Cat Breed Information (TheCatAPI)"},
+    "fish": {"data_reference": "https://www.fishwatch.gov/api/species", "description": "Fish Database (NOAA FishWatch)"},
+    "plants": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=Rose&format=json", "description": "Plant and Flower Database (Wikipedia)"},
+    "games": {"data_reference": "https://www.freetogame.com/api/games", "description": "Free-to-Play Games Database (FreetoGame)"},
+    "art": {"data_reference": "https://collectionapi.metmuseum.org/public/collection/v1/objects/436535", "description": "Public Domain Art (The Met Museum)"},
+    "music_midi": {"data_reference": "https://musicbrainz.org/ws/2/artist/5b11f4ce-a62d-471e-81fc-a69a8278c7da?fmt=json", "description": "Music Information Database (MusicBrainz)"},
+    "science_physics": {"data_reference": "https://api.le-systeme-solaire.net/rest/bodies/soleil", "description": "Physics and Astronomy API (The Solar System)"},
+    "math": {"data_reference": "http://numbersapi.com/42/math", "description": "Math Facts (Numbers API)"},
+    "music_theory": {"data_reference": "https://api.uberchord.com/v1/chords/C_maj", "description": "Music Education API (Uberchord)"},
+    "food": {"data_reference": "https://world.openfoodfacts.org/api/v2/product/737628064502", "description": "Food Product Ingredients (Open Food Facts)"},
+}
+
+# Hosted Edition APIs: Includes community APIs plus private or key-required APIs.
+_HOSTED_APIS={
+    **_COMMUNITY_APIS,
+    "movies": {"data_reference": "https://api.themoviedb.org/3/search/movie?query=Inception&api_key=YOUR_API_KEY", "description": "Movie Database (TMDb) - Requires API Key"},
+    "grammar": {"data_reference": "https://api.languagetool.org/v2/check?language=en-US&text=this+is+a+test", "description": "Writing and Grammar API (LanguageTool)"},
+    "stock": {"data_reference": "https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo", "description": "Stock Data (Alpha Vantage)"},
+    "government": {"data_reference": "https://api.usa.gov/crime/fbi/sapi/api/data/nibrs/homicide/offense/agencies/count", "description": "Government API (FBI Crime Data)"}
+}
+
+
+def _current_edition() -> str:
+    # Default to "COMMUNITY" if the environment variable is not set.
+    return os.environ.get('BUTTERFLY_EDITION', 'COMMUNITY').upper()
+
+
+def _api_definitions_for(edition: str) -> dict:
+    return _HOSTED_APIS if edition == 'HOSTED' else _COMMUNITY_APIS
+
+
+@cache
+def _available_apis_for(edition: str) -> list:
+    """The client-facing API list for an edition. Computed once; callers must not mutate it."""
+    return [{"api_type": key, "description": value["description"]}
+            for key, value in _api_definitions_for(edition).items()]
+
+
 class PointerHelper:
     """
     The PointerHelper acts as the central hub for managing the pointer graph. It
@@ -258,42 +1063,65 @@ class PointerHelper:
 
     def __init__(self, db_config: dict, gyroid_threshold: float=0.5):
         self.audit_module=AuditModule(db_config)
+        # Handlers share the audit module's connection.
+        self.db_manager=self.audit_module.db_manager
         self.encryption_module=EncryptionModule()
         self.cycle_module=CycleModule()
         self._gyroid_threshold=gyroid_threshold
-        # --- Action Dispatcher ---
-        # Refactors the large if/elif block into a modular, extensible dispatcher.
-        # This aligns with the principle of "flexibility by design".
-        self.actions={
-            "create_pointer": self._handle_create_pointer,
-            "get_pointer": self._handle_get_pointer,
-            "add_neighbor": self._handle_add_neighbor,
-            "get_neighbors": self._handle_get_neighbors,
-            "initiate_federation": self._handle_initiate_federation,
-            "accept_federation": self._handle_accept_federation,
-            "revoke_federation": self._handle_revoke_federation,
-            "get_federation_status": self._handle_get_federation_status,
-            "create_domain": self._handle_create_domain,
-            "generate_access_key": self._handle_generate_access_key,
-            "get_domain_details": self._handle_get_domain_details,
-            "revoke_access_key": self._handle_revoke_access_key,
-            "set_connection_status": self._handle_set_connection_status,
-            "create_connection": self._handle_create_connection,
-            "assign_pointer_to_connection": self._handle_assign_pointer_to_connection,
-            "invoke_through_connection": self._handle_invoke_through_connection,
-            "get_pointers_for_connection": self._handle_get_pointers_for_connection,
-            "search_pointers": self._handle_search_pointers,
-            "search_by_proximity": self._handle_search_by_proximity,
-            "get_graph_stats": self._handle_get_graph_stats,
-            "get_admin_overview": self._handle_get_admin_overview,
-            "get_graph_dot": self._handle_get_graph_dot,
-
-            "create_circuit": self._handle_create_circuit,
-            "get_pointer_summary": self._handle_get_pointer_summary,
-            "execute_creation_model": self._handle_execute_creation_model,
-            # Add other actions here...
-        }
-        print("[*] PointerHelper initialized.")
+        # (version, addresses, coordinates) for the NumPy proximity fallback.
+        self._coordinate_cache=None
+        logger.info("PointerHelper initialized.")
+
+    def close(self):
+        """Flushes the audit log and releases the database connections and writer thread."""
+        self.audit_module.close()
+
+    def _pointer_coordinate_arrays(self):
+        """
+        Returns every pointer address with an (N, 3) float64 coordinate array, loaded once
+        and reused until the pointers table changes. The version is the generation counter
+        the pointers triggers bump on any insert, delete or coordinate update, from this or
+        another process.
+        """
+        version=self.db_manager.execute(_SQL_POINTER_COORDINATE_VERSION).fetchone()
+        cache=self._coordinate_cache
+        if cache is not None and cache[0] == version:
+            return cache[1], cache[2]
+        rows=self.db_manager.execute(_SQL_ALL_POINTER_COORDINATES).fetchall()
+        addresses=[row[0] for row in rows]
+        coordinates=np.array([row[1:] for row in rows], dtype=np.float64).reshape(-1, 3)
+        self._coordinate_cache=(version, addresses, coordinates)
+        return addresses, coordinates
+
+    def _select_within_radius(self, origin_address: str, origin: tuple, radius: float, page: tuple=None):
+        """
+        Returns a cursor over the pointers within `radius` of `origin`, excluding the origin
+        pointer itself. Uses the R*Tree when available, otherwise a vectorized NumPy distance
+        pass over the cached coordinates, and a plain table scan as the last resort.
+
+        With `page` as (after_created_at, after_address, limit) the full pointer columns are
+        returned one keyset page at a time; without it only address and description.
+        """
+        ox, oy, oz=origin
+        radius_squared=radius ** 2
+        brief=page is None
+        page=() if brief else tuple(page)
+        if self.audit_module.has_rtree:
+            # The R*Tree narrows the candidates to the bounding cube around the origin in O(log N),
+            # then the exact squared Euclidean distance is checked on that small residual set.
+            return self.db_manager.execute(_SQL_PROXIMITY_BRIEF if brief else _SQL_PROXIMITY, (
+                ox - radius, ox + radius, oy - radius, oy + radius, oz - radius, oz + radius,
+                ox, ox, oy, oy, oz, oz, radius_squared, origin_address) + page)
+        if np is not None:
+            addresses, coordinates=self._pointer_coordinate_arrays()
+            delta=coordinates - np.array(origin, dtype=np.float64)
+            within=np.flatnonzero(np.einsum('ij,ij->i', delta, delta) <= radius_squared)
+            matches=[addresses[i] for i in within.tolist() if addresses[i] != origin_address]
+            return self.db_manager.execute(
+                _SQL_PROXIMITY_BY_ADDRESS_BRIEF if brief else _SQL_PROXIMITY_BY_ADDRESS,
+                (orjson.dumps(matches).decode('utf-8'),) + page)
+        return self.db_manager.execute(_SQL_PROXIMITY_SCAN_BRIEF if brief else _SQL_PROXIMITY_SCAN, (
+            ox, ox, oy, oy, oz, oz, radius_squared, origin_address) + page)
 
     def _evaluate_expression(self, expression: str, results: list):
         """Evaluates an expression against the results of previous steps."""
@@ -347,6 +1175,12 @@ class PointerHelper:
         Refactored to use a single, non-iterative SQL query, adhering to the
         "no iterations" paradigm for runtime operations.
         """
+        if np is not None:
+            num_pointers=self.db_manager.execute("SELECT COUNT(*) FROM pointers").fetchone()[0]
+            if num_pointers >= GYROID_BATCH_MIN_POINTERS:
+                self._add_pointer_to_gyroid_structure_batch(pointer_address)
+                return
+
         # This query joins the pointers table with itself to calculate the gyroid score
         # for all pairs involving the new pointer, inserting relationships in one go.
         # The SQLite `abs`, `sin`, and `cos` functions are used for efficiency.
@@ -360,9 +1194,34 @@ class PointerHelper:
         """, (pointer_address,))
         self.audit_module.commit()
 
+    def _add_pointer_to_gyroid_structure_batch(self, pointer_address: str):
+        """
+        Scores a new pointer against the whole graph in one batch (the Numba kernel when
+        available, NumPy ufuncs otherwise) and bulk-inserts the resulting relationships.
+        Produces the same rows as the SQL path.
+        """
+        origin_row=self.db_manager.execute(
+            "SELECT x, y, z FROM pointers WHERE address = ?", (pointer_address,)).fetchone()
+        if not origin_row:
+            return
+        rows=self.db_manager.execute(
+            "SELECT address, x, y, z FROM pointers WHERE address != ?", (pointer_address,)).fetchall()
+        coords=np.array([tuple(row)[1:] for row in rows], dtype=np.float64).reshape(-1, 3)
+        ref=np.array(tuple(origin_row), dtype=np.float64)
+        if _gyroid_scores is not None:
+            scores=np.empty(len(rows), dtype=np.float64)
+            _gyroid_scores(ref[0], ref[1], ref[2], coords[:, 0], coords[:, 1], coords[:, 2], scores)
+        else:
+            scores=_gyroid_scores_batch(coords, ref)
+
+        self.db_manager.conn.executemany(
+            "INSERT INTO relationships (pointer_a_address, pointer_b_address, relationship, weight) VALUES (?, ?, 'gyroid_related', ?)",
+            [(pointer_address, row[0], score) for row, score in zip(rows, scores.tolist())])
+        self.audit_module.commit()
+
     def invoke(self, query: dict) -> dict:
         """This is the single entry point for all interactions with the system."""
-        print(f"[*] Received invocation query: {query}")
+        logger.debug("Received invocation query: %s", query)
 
         action_name=query.get("action")
 
@@ -370,13 +1229,14 @@ class PointerHelper:
         if not action_name:
             return {"status": "error", "message": "Query must include an 'action'."}
 
-        handler=self.actions.get(action_name)
-        if handler:
+        handler=getattr(self, _ACTIONS.get(action_name, ""), None)
+        if handler is None:
+            return {"status": "error", "message": f"Unknown action: '{action_name}'"}
+        # Every write the action makes, including nested handlers, is committed once at the end,
+        # or rolled back if the handler raises.
+        with self.db_manager.deferred_commit():
             return handler(query)
 
-        else:
-            return self._handle_unrefactored_action(query)
-
     def _execute_circuit(self, circuit_definition: list) -> list:
         """Executes a circuit definition, substituting placeholders with results from previous steps."""
         results=[]
@@ -389,7 +1249,7 @@ class PointerHelper:
             if not action_name:
                 return {"status": "error", "message": "Circuit action must include an 'action'."}
 
-            handler=self.actions.get(action_name)
+            handler=getattr(self, _ACTIONS.get(action_name, ""), None)
             if handler:
                 result=handler(substituted_action)
                 if result.get("status") == "success":
@@ -402,62 +1262,13 @@ class PointerHelper:
                 return {"status": "error", "message": f"Unknown action: '{action_name}'"}
         return results
 
-    def _handle_invoke_through_connection(self, query: dict) -> dict:
-        if data_reference_str.startswith('internal_circuit::'):
-            try:
-                circuit_definition_str=data_reference_str.split('::', 1)[1]
-                circuit_definition=json.loads(circuit_definition_str)
-                # Recursively call invoke to execute the circuit
-                return self._execute_circuit(circuit_definition)
-            except Exception as e:
-                return {"status": "error", "message": f"Failed to execute internal circuit: {str(e)}"}
-            # Fallback for un-refactored or new actions
-            return self._handle_unrefactored_action(query)
-
     def _get_predefined_api(self, api_type: str | None) -> dict | None:
         """
         Returns the data_reference and description for a predefined API connection.
         This method centralizes the definitions for out-of-the-box connections.
         If api_type is None, it returns all available APIs for the current edition.
         """
-        # Community Edition APIs: Freely available, no keys required.
-        community_apis={
-            "news": {"data_reference": "https://www.reddit.com/.json", "description": "Free News Feed (Reddit)"},
-            "trivia": {"data_reference": "https://opentdb.com/api.php?amount=1", "description": "Trivia Questions (Open Trivia DB)"},
-            "knowledge": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=Albert%20Einstein&format=json", "description": "General Knowledge (Wikipedia API)"},
-            "history": {"data_reference": "http://numbersapi.com/random/date", "description": "Historical Date Facts (Numbers API)"},
-            "joke_ai": {"data_reference": "https://v2.jokeapi.dev/joke/Any?format=json", "description": "Lightweight Joke Generation AI"},
-            "advice_ai": {"data_reference": "https://api.adviceslip.com/advice", "description": "Lightweight Advice Generation AI"},
-            "gis": {"data_reference": "https://nominatim.openstreetmap.org/search?q=Eiffel+Tower&format=json", "description": "Geographic Information (Nominatim)"},
-            "city": {"data_reference": "https://api.teleport.org/api/cities/geonameid:5128581/", "description": "City Information (Teleport)"},
-            "country": {"data_reference": "https://restcountries.com/v3.1/name/united", "description": "Country Information (REST Countries)"},
-            "street": {"data_reference": "https://nominatim.openstreetmap.org/reverse?format=jsonv2&lat=40.714224&lon=-73.961452", "description": "Street Name (Nominatim)"},
-            "landmarks": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=geosearch&gscoord=48.858|2.294&gsradius=10000&format=json", "description": "Earth Landmarks (Wikipedia GeoSearch)"},
-            "animals": {"data_reference": "https://zoo-animal-api.herokuapp.com/animals/rand", "description": "Animal and Wildlife Database"},
-            "cats": {"data_reference": "https://api.thecatapi.com/v1/breeds/abys", "description": "Cat Breed Information (TheCatAPI)"},
-            "fish": {"data_reference": "https://www.fishwatch.gov/api/species", "description": "Fish Database (NOAA FishWatch)"},
-            "plants": {"data_reference": "https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=Rose&format=json", "description": "Plant and Flower Database (Wikipedia)"},
-            "games": {"data_reference": "https://www.freetogame.com/api/games", "description": "Free-to-Play Games Database (FreetoGame)"},
-            "art": {"data_reference": "https://collectionapi.metmuseum.org/public/collection/v1/objects/436535", "description": "Public Domain Art (The Met Museum)"},
-            "music_midi": {"data_reference": "https://musicbrainz.org/ws/2/artist/5b11f4ce-a62d-471e-81fc-a69a8278c7da?fmt=json", "description": "Music Information Database (MusicBrainz)"},
-            "science_physics": {"data_reference": "https://api.le-systeme-solaire.net/rest/bodies/soleil", "description": "Physics and Astronomy API (The Solar System)"},
-            "math": {"data_reference": "http://numbersapi.com/42/math", "description": "Math Facts (Numbers API)"},
-            "music_theory": {"data_reference": "https://api.uberchord.com/v1/chords/C_maj", "description": "Music Education API (Uberchord)"},
-            "food": {"data_reference": "https://world.openfoodfacts.org/api/v2/product/737628064502", "description": "Food Product Ingredients (Open Food Facts)"},
-        }
-
-        # Hosted Edition APIs: Includes community APIs plus private or key-required APIs.
-        hosted_apis={
-            **community_apis,
-            "movies": {"data_reference": "https://api.themoviedb.org/3/search/movie?query=Inception&api_key=YOUR_API_KEY", "description": "Movie Database (TMDb) - Requires API Key"},
-            "grammar": {"data_reference": "https://api.languagetool.org/v2/check?language=en-US&text=this+is+a+test", "description": "Writing and Grammar API (LanguageTool)"},
-            "stock": {"data_reference": "https://www.alphavantage.co/query?function=TIME_SERIES_INTRADAY&symbol=IBM&interval=5min&apikey=demo", "description": "Stock Data (Alpha Vantage)"},
-            "government": {"data_reference": "https://api.usa.gov/crime/fbi/sapi/api/data/nibrs/homicide/offense/agencies/count", "description": "Government API (FBI Crime Data)"}
-        }
-
-        # Default to "COMMUNITY" if the environment variable is not set.
-        edition=os.environ.get('BUTTERFLY_EDITION', 'COMMUNITY').upper()
-        api_definitions=hosted_apis if edition == 'HOSTED' else community_apis
+        api_definitions=_api_definitions_for(_current_edition())
 
         if api_type is None:
             return api_definitions  # Return all available APIs for the edition
@@ -470,17 +1281,12 @@ class PointerHelper:
             if not data_reference:
                 return {"status": "error", "message": "Action 'create_pointer' requires a 'data_reference'."}
 
-            cursor=self.db_manager.execute(
-                "SELECT address FROM pointers WHERE data_reference = ?", (data_reference,))
-            existing=cursor.fetchone()
-            if existing:
-                return {
-                    "status": "error",
-                    "message": f"A pointer for this data_reference already exists at address: {existing[0]}"
-                }
-
             # Generate a unique, immutable address for the new pointer (SRL).
-            address=f"ptr_{uuid.uuid4().hex[:12]}"
+            address=f"ptr_{secrets.token_hex(6)}"
+            # created_at and last_modified are always equal for a new pointer.
+            now=_utcnow_iso()
+
+            tags=query.get("tags", [])
 
             # Create the pointer object. For now, it's a simple dictionary.
             new_pointer={
@@ -488,33 +1294,46 @@ class PointerHelper:
                 "description": query.get("description", ""),
                 # What the pointer points to.
                 "data_reference": data_reference,
-                "tags": json.dumps(query.get("tags", [])),
+                "tags": orjson.dumps(tags).decode('utf-8'),
                 "x": query.get("x", 0.0),
                 "y": query.get("y", 0.0),
                 "z": 0,  # Z (delta) always starts at 0
                 "connection_id": query.get("connection_id"),  # Can be null
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "last_modified": datetime.now(timezone.utc).isoformat()
+                "created_at": now,
+                "last_modified": now
             }
             # Update x, y, z coordinates based on hash if not provided
             if query.get("x") is None and query.get("y") is None and query.get("z") is None:
                 new_pointer["x"], new_pointer["y"], new_pointer["z"]=_hash_to_vector3(
                     address)
 
-            self.db_manager.execute("""
+            # The UNIQUE constraint on data_reference doubles as the duplicate check, so the
+            # fast path is a single statement. Nothing is returned if the reference already exists.
+            cursor=self.db_manager.execute("""
                 INSERT INTO pointers(address, description, data_reference, tags, connection_id, x, y, z, created_at, last_modified)
-                VALUES(: address, : description, : data_reference, : tags, : connection_id, : x, : y, : z, : created_at, : last_modified)
+                VALUES(:address, :description, :data_reference, :tags, :connection_id, :x, :y, :z, :created_at, :last_modified)
+                ON CONFLICT(data_reference) DO NOTHING
+                RETURNING address
             """, new_pointer)
+            inserted=cursor.fetchone()
+            if not inserted:
+                cursor=self.db_manager.execute(
+                    "SELECT address FROM pointers WHERE data_reference = ?", (data_reference,))
+                existing=cursor.fetchone()
+                return {
+                    "status": "error",
+                    "message": f"A pointer for this data_reference already exists at address: {existing[0]}"
+                }
             self.audit_module.commit()
 
-            print(
-                f"[*] Pointer (SRL) created: {address} -> '{new_pointer['description']}'")
+            logger.info(
+                "Pointer (SRL) created: %s -> '%s'", address, new_pointer['description'])
 
             # Calculate gyroid relationships for the new pointer
             self._add_pointer_to_gyroid_structure(address)
 
-            # Prepare response, converting JSON strings back to lists
-            new_pointer['tags'] = json.loads(new_pointer.get('tags', '[]')) # Ensure tags are a list for the response
+            # Prepare response, reusing the original list instead of re-parsing the stored JSON
+            new_pointer['tags'] = tags
             return {
                 "status": "success",
                 "result": {
@@ -533,9 +1352,21 @@ class PointerHelper:
                 }
             }
 
+    def _handle_get_pointer(self, query: dict) -> dict:
+            pointer_address=query.get("pointer_address")
+
+            if not pointer_address:
+                return {"status": "error", "message": "Action 'get_pointer' requires a 'pointer_address'."}
+
+            row=self.db_manager.execute(
+                _SQL_POINTER_BY_ADDRESS, (pointer_address,)).fetchone()
+            if not row:
+                return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
+            pointer_data=_pointer_from_row(row)
+
             # Fetch neighbors from the new relationships table
             cursor=self.db_manager.execute(
-                "SELECT pointer_b_address, relationship, weight FROM relationships WHERE pointer_a_address = ?", (pointer_address,))
+                _SQL_POINTER_NEIGHBORS, (pointer_address,))
             neighbors=[]  # Ensure neighbors is always a list
             for neighbor_row in cursor.fetchall():
                 neighbors.append(
@@ -570,11 +1401,11 @@ class PointerHelper:
                 # This relationship already exists, which is fine.
                 pass
 
-            print(
-                f"[*] Neighbor relationship created between {pointer_address} and {neighbor_address}.")
+            logger.info(
+                "Neighbor relationship created between %s and %s.", pointer_address, neighbor_address)
 
             # Update the last_modified timestamp for both pointers
-            timestamp=datetime.now(timezone.utc).isoformat()
+            timestamp=_utcnow_iso()
             self.db_manager.execute("UPDATE pointers SET last_modified = ? WHERE address = ?",
                            (timestamp, pointer_address))
             self.db_manager.execute("UPDATE pointers SET last_modified = ? WHERE address = ?",
@@ -598,7 +1429,7 @@ class PointerHelper:
                 return {"status": "error", "message": "Action 'get_neighbors' requires a 'pointer_address'."}
 
             cursor=self.db_manager.execute(
-                "SELECT pointer_b_address, relationship, weight FROM relationships WHERE pointer_a_address = ?", (pointer_address,))
+                _SQL_POINTER_NEIGHBORS, (pointer_address,))
 
             neighbors=[]
             for row in cursor.fetchall():
@@ -675,8 +1506,8 @@ class PointerHelper:
         if source_domain_id == target_domain_id:
             return {"status": "error", "message": "A domain cannot federate with itself."}
 
-        federation_id=f"fed_{uuid.uuid4().hex[:12]}"
-        request_key=f"fed_req_{uuid.uuid4().hex}"
+        federation_id=f"fed_{secrets.token_hex(6)}"
+        request_key=f"fed_req_{secrets.token_hex(16)}"
 
         fed_data={
             "id": federation_id,
@@ -685,7 +1516,7 @@ class PointerHelper:
             "status": "pending",
             "permissions": json.dumps(permissions),
             "request_key": request_key,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": _utcnow_iso()
         }
 
         self.db_manager.execute(
@@ -711,7 +1542,7 @@ class PointerHelper:
             return {"status": "error", "message": "Action 'accept_federation' requires a 'request_key'."}
 
         target_domain_id=auth_context.get('domain_id')
-        accepted_at=datetime.now(timezone.utc).isoformat()
+        accepted_at=_utcnow_iso()
 
         cursor=self.db_manager.execute(
             "UPDATE federations SET status = 'accepted', accepted_at = ? WHERE request_key = ? AND target_domain_id = ? AND status = 'pending'", (accepted_at, request_key, target_domain_id))
@@ -729,11 +1560,11 @@ class PointerHelper:
             if not name:
                 return {"status": "error", "message": "Action 'create_domain' requires a 'name'."}
 
-            domain_id=f"dom_{uuid.uuid4().hex[:12]}"
+            domain_id=f"dom_{secrets.token_hex(6)}"
             new_domain={
                 "id": domain_id,
                 "name": name,
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": _utcnow_iso()
             }
 
             self.db_manager.execute(
@@ -869,13 +1700,13 @@ class PointerHelper:
             # In a real system, you'd verify the user has rights to create a key for this domain.
             # For now, we assume the initial admin key is used.
 
-            access_key=f"key_{uuid.uuid4().hex}"
+            access_key=f"key_{secrets.token_hex(16)}"
             key_data={
                 "key": access_key,
                 "domain_id": domain_id,
                 # Store as JSON string
                 "permissions": json.dumps(permissions_list),
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": _utcnow_iso()
             }
             self.db_manager.execute(
                 "INSERT INTO access_keys (key, domain_id, permissions, created_at) VALUES (?, ?, ?, ?)",
@@ -904,11 +1735,11 @@ class PointerHelper:
             description=api_data["description"] if api_data else query.get(
                 "description", "")
 
-            connection_id=f"conn_{uuid.uuid4().hex[:12]}"
+            connection_id=f"conn_{secrets.token_hex(6)}"
             new_connection={
                 "id": connection_id, "name": name, "description": description, "status": "active",
                 "allow_writes": 1 if query.get("allow_writes") is True else 0, "domain_id": domain_id, # Added missing created_at
-                "created_at": datetime.now(timezone.utc).isoformat()
+                "created_at": _utcnow_iso()
             }
 
             self.db_manager.execute("""
@@ -930,35 +1761,39 @@ class PointerHelper:
             if not all([pointer_address, connection_id, auth_context]):
                 return {"status": "error", "message": "Action 'assign_pointer_to_connection' requires 'pointer_address', 'connection_id', and an access key."}
 
-            # Verify the key has rights to the domain of the connection
-            cursor=self.db_manager.execute(
-                "SELECT domain_id FROM connections WHERE id = ?", (connection_id,))
-            # Also check if the connection is active
-            cursor=self.db_manager.execute(
-                "SELECT domain_id, status FROM connections WHERE id = ?", (
-                    connection_id,)
-            )
-            conn_row=cursor.fetchone()
-            if conn_row and conn_row['status'] == 'disabled':
-                return {"status": "error", "message": f"Access denied. Connection '{connection_id}' is disabled."}
-            conn_domain_row=cursor.fetchone()  # The domain this connection belongs to
             # The domain of the app making the request
             requesting_domain_id=auth_context.get('domain_id')
 
-            # Allow if the key's domain is the same as the connection's domain OR if there is an accepted federation.
-            is_owner=conn_domain_row and conn_domain_row[0] == requesting_domain_id
-            is_federated=conn_domain_row and self._is_federated(
-                requesting_domain_id, conn_domain_row[0])
-            if not (is_owner or is_federated):
+            # The authorization check is folded into the UPDATE itself, so the common (allowed) case is
+            # a single statement. The pointer is only reassigned when the connection is active and the
+            # key's domain owns it OR has an accepted federation with the domain that does.
+            cursor=self.db_manager.execute("""
+                UPDATE pointers SET connection_id = ?
+                WHERE address = ? AND EXISTS (
+                    SELECT 1 FROM connections c
+                    WHERE c.id = ? AND c.status != 'disabled'
+                    AND (c.domain_id = ? OR EXISTS (
+                        SELECT 1 FROM federations f
+                        WHERE f.status = 'accepted'
+                        AND ((f.source_domain_id = ? AND f.target_domain_id = c.domain_id)
+                            OR (f.target_domain_id = ? AND f.source_domain_id = c.domain_id))))
+                )
+            """, (connection_id, pointer_address, connection_id, requesting_domain_id, requesting_domain_id, requesting_domain_id))
+
+            if cursor.rowcount == 0:
+                # Nothing was updated. Only this failure path pays for working out why.
+                conn_row=self.db_manager.execute(
+                    "SELECT status FROM connections WHERE id = ?", (connection_id,)).fetchone()
+                if conn_row and conn_row['status'] == 'disabled':
+                    return {"status": "error", "message": f"Access denied. Connection '{connection_id}' is disabled."}
+                pointer_row=self.db_manager.execute(
+                    "SELECT 1 FROM pointers WHERE address = ?", (pointer_address,)).fetchone()
+                if conn_row and not pointer_row:
+                    return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
                 return {"status": "error", "message": "Access denied. The provided key is not valid for the domain containing this connection."}
 
-            cursor=self.db_manager.execute("UPDATE pointers SET connection_id = ? WHERE address = ?",
-                                             (connection_id, pointer_address))
             self.audit_module.commit()
 
-            if cursor.rowcount == 0:
-                return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
-
             return {"status": "success", "result": {"message": f"Pointer {pointer_address} assigned to connection {connection_id}."}}
 
     def _handle_invoke_through_connection(self, query: dict) -> dict:
@@ -969,34 +1804,31 @@ class PointerHelper:
             if not all([connection_id, pointer_address, auth_context]):
                 return {"status": "error", "message": "Action 'invoke_through_connection' requires 'connection_id', 'pointer_address', and an access key."}
 
-            # Verify the key has rights to the domain of the connection
-            cursor=self.db_manager.execute(
-                "SELECT domain_id FROM connections WHERE id = ?", (connection_id,))
-            conn_domain_row=cursor.fetchone()  # The domain this connection belongs to
             # The domain of the app making the request
             requesting_domain_id=auth_context.get('domain_id')
+            # The connection's domain, the federation check, the pointer, and its credential
+            # pointer in one query.
+            cursor=self.db_manager.execute(
+                _SQL_INVOCATION_CONTEXT, (requesting_domain_id, requesting_domain_id, pointer_address, connection_id))
+            row=cursor.fetchone()
 
+            # Verify the key has rights to the domain of the connection.
             # Allow if the key's domain is the same as the connection's domain OR if there is an accepted federation.
-            is_owner=conn_domain_row and conn_domain_row[0] == requesting_domain_id
-            is_federated=conn_domain_row and self._is_federated(
-                requesting_domain_id, conn_domain_row[0])
+            is_owner=row and row[0] == requesting_domain_id
+            is_federated=row and row[5]
             if not (is_owner or is_federated):
                 return {"status": "error", "message": "Access denied. The provided key is not valid for the domain containing this connection."}
 
-            cursor=self.db_manager.execute(
-                "SELECT connection_id, data_reference FROM pointers WHERE address = ?", (pointer_address,))
-            row=cursor.fetchone()
-
-            if not row:
-                return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
-
             # This is a more complex proxy model now.
             # The SRL is the internal concept, but the invocation now performs the final data fetch.
             # This aligns with the "knock on the door" + "credentials" model.
             # The original SRL generation logic is superseded by this more secure proxy.
 
-            # 1. Fetch pointer details, including the credential link
-            p_conn_id, data_reference_str=row
+            # 1. Pointer details, including the credential link
+            _, p_conn_id, data_reference_str, cred_ptr_address, cred_data_reference, _=row
+
+            if data_reference_str is None:
+                return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
 
             if p_conn_id != connection_id:
                 return {
@@ -1015,24 +1847,16 @@ class PointerHelper:
                     return {"status": "error", "message": f"Failed to execute internal circuit: {str(e)}"}
 
             # 2. Check if this invocation requires native credentials
-            cursor=self.db_manager.execute(
-                "SELECT credential_pointer_address FROM pointers WHERE address = ?", (pointer_address,))
-            cred_ptr_row=cursor.fetchone()
             native_auth_header=None
 
-            if cred_ptr_row and cred_ptr_row['credential_pointer_address']:
-                cred_ptr_address=cred_ptr_row['credential_pointer_address']
-                # Fetch the credential pointer
-                cred_cursor=self.db_manager.execute(
-                    "SELECT data_reference FROM pointers WHERE address = ?", (cred_ptr_address,))
-                cred_data_row=cred_cursor.fetchone()
-                if not cred_data_row:
+            if cred_ptr_address:
+                if cred_data_reference is None:
                     return {"status": "error", "message": f"Credential pointer '{cred_ptr_address}' not found."}
 
                 # 3. Decrypt credentials in memory
                 try:
                     credentials=self.encryption_module.decrypt(
-                        cred_data_row['data_reference'])
+                        cred_data_reference)
                     # Assuming credentials are in the format {"header": "Authorization", "token": "Bearer ..."}
                     if "header" in credentials and "token" in credentials:
                         native_auth_header={
@@ -1045,10 +1869,12 @@ class PointerHelper:
             # 4. Make the final, authenticated request to the target datastore
             try:
                 headers=native_auth_header if native_auth_header else {}
-                response=requests.get(data_reference_str,
-                                      headers=headers, timeout=10)
-                response.raise_for_status()
-                data_payload=response.json()
+                # Stream the body so oversized responses are cut off at MAX_FETCH_BYTES instead of
+                # being loaded whole; the context manager returns the socket to the pool either way.
+                with _http_session.get(data_reference_str, headers=headers,
+                                       timeout=HTTP_TIMEOUT, stream=True) as response:
+                    response.raise_for_status()
+                    data_payload=json.loads(_read_capped_body(response))
 
                 self.audit_module.log(
                     action="invoke_and_proxy",
@@ -1099,39 +1925,35 @@ class PointerHelper:
             auth_context=query.get("auth_context", {})  # From JWT
             if not connection_id or not auth_context:
                 return {"status": "error", "message": "Action 'get_pointers_for_connection' requires 'connection_id' and an access key."}
+            try:
+                page_size, after=_read_page_request(query)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
 
+            # The domain of the app making the request
+            requesting_domain_id=auth_context.get('domain_id')
             # Verify the key has rights to the domain of the connection
             cursor=self.db_manager.execute(
-                "SELECT domain_id FROM connections WHERE id = ?", (connection_id,))
+                _SQL_CONNECTION_ACCESS, (requesting_domain_id, requesting_domain_id, connection_id))
             conn_domain_row=cursor.fetchone()  # The domain this connection belongs to
-            # The domain of the app making the request
-            requesting_domain_id=auth_context.get('domain_id')
 
             # Allow if the key's domain is the same as the connection's domain OR if there is an accepted federation.
             is_owner=conn_domain_row and conn_domain_row[0] == requesting_domain_id
-            is_federated=conn_domain_row and self._is_federated(
-                requesting_domain_id, conn_domain_row[0])
+            is_federated=conn_domain_row and conn_domain_row[1]
             if not (is_owner or is_federated):
                 return {"status": "error", "message": "Access denied. The provided key is not valid for the domain containing this connection."}
 
             cursor=self.db_manager.execute(
-                "SELECT * FROM pointers WHERE connection_id = ?", (connection_id,))
-            rows=cursor.fetchall()
-
-            pointers_list=[]
-            for row in rows:
-                pointer_data={
-                    "address": row[0], "description": row[1], "data_reference": row[2],
-                    "tags": json.loads(row[3]), "connection_id": row[4],
-                    "x": row[5], "y": row[6], "z": row[7],
-                    "created_at": row[8], "last_modified": row[9]
-                }
-                pointers_list.append(pointer_data)
+                _SQL_POINTERS_FOR_CONNECTION, (connection_id, *after, page_size + 1))
+            rows, next_cursor=_split_page(cursor.fetchall(), page_size)
+
+            pointers_list=[_pointer_from_row(row) for row in rows]
 
             return {
                 "status": "success",
                 "result": {
-                    "pointers": pointers_list
+                    "pointers": pointers_list,
+                    "next_cursor": next_cursor
                 }
             }
 
@@ -1144,55 +1966,58 @@ class PointerHelper:
 
             if not search_term and not search_tags:
                 return {"status": "error", "message": "Action 'search_pointers' requires at least a 'search_term' or 'search_tags'."}
+            try:
+                page_size, after=_read_page_request(query)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
 
             where_clauses=[]
             params=[]
 
             if search_term:
-                where_clauses.append("description LIKE ?")
+                if self.audit_module.has_fts:
+                    where_clauses.append(
+                        "p.id IN (SELECT rowid FROM pointers_fts WHERE description LIKE ?)")
+                else:
+                    where_clauses.append("p.description LIKE ?")
                 params.append(f"%{search_term}%")
 
+            # Tag filters probe the indexed pointer_tags table rather than substring-scanning the JSON column.
             if search_tags:
                 if not isinstance(search_tags, list):
                     return {"status": "error", "message": "'search_tags' must be a list."}
+                tags_json=orjson.dumps(search_tags).decode('utf-8')
                 if tag_match_mode == "ALL":
-                    for tag in search_tags:
-                        where_clauses.append("tags LIKE ?")
-                        params.append(f'%"{tag}"%')
+                    where_clauses.append(_TAG_FILTER_ALL)
+                    params.extend((tags_json, tags_json))
                 elif tag_match_mode == "ANY":
-                    any_clause=" OR ".join(
-                        ["tags LIKE ?" for _ in search_tags])
-                    where_clauses.append(f"({any_clause})")
-                    params.extend([f'%"{tag}"%' for tag in search_tags])
+                    where_clauses.append(_TAG_FILTER_ANY)
+                    params.append(tags_json)
                 else:
                     return {"status": "error", "message": "'tag_match_mode' must be 'ANY' or 'ALL'."}
 
             if exclude_tags:
                 if not isinstance(exclude_tags, list):
                     return {"status": "error", "message": "'exclude_tags' must be a list."}
-                for tag in exclude_tags:
-                    where_clauses.append("tags NOT LIKE ?")
-                    params.append(f'%"{tag}"%')
+                where_clauses.append(_TAG_FILTER_EXCLUDE)
+                params.append(orjson.dumps(exclude_tags).decode('utf-8'))
 
             # Build the final query
-            # Use json_group_array and json_each to perform the search efficiently in the DB
-            sql_query="""
-                SELECT p.address, p.description, p.data_reference, p.tags, p.connection_id, p.x, p.y, p.z, p.created_at, p.last_modified
+            sql_query=f"""
+                SELECT {_POINTER_COLUMNS}
                 FROM pointers p
+                WHERE 1
             """
             if where_clauses:
-                sql_query += " WHERE " + " AND ".join(where_clauses)
+                sql_query += " AND " + " AND ".join(where_clauses)
+            sql_query += _KEYSET_PAGE
+            params.extend((*after, page_size + 1))
 
             cursor=self.db_manager.execute(sql_query, params)
-            rows=cursor.fetchall()
+            rows, next_cursor=_split_page(cursor.fetchall(), page_size)
 
             # No iteration needed here. The data is already fetched.
-            matching_pointers=[{
-                "address": row[0], "description": row[1], "data_reference": row[2],
-                "tags": json.loads(row[3]), "connection_id": row[4],
-                "x": row[5], "y": row[6], "z": row[7],
-                "created_at": row[8], "last_modified": row[9]
-            } for row in rows]
+            matching_pointers=[_pointer_from_row(row) for row in rows]
 
             # --- Cycle Module Integration ---
             # A search returning many results is considered less "optimal"
@@ -1201,14 +2026,15 @@ class PointerHelper:
             # We would need to pass an operation ID to this action to track it.
             # self.cycle_module.advance_cycle(op_id, is_optimal=is_search_optimal)
 
-            print(
-                f"[*] Search found {len(matching_pointers)} matching pointers.")
+            logger.debug(
+                "Search found %d matching pointers.", len(matching_pointers))
 
             return {
                 "status": "success",
                 "result": {
                     "count": len(matching_pointers),
                     "pointers": matching_pointers,
+                    "next_cursor": next_cursor,
                 }
             }
 
@@ -1218,46 +2044,35 @@ class PointerHelper:
 
             if not origin_pointer_address or radius is None:
                 return {"status": "error", "message": "Action 'search_by_proximity' requires 'origin_pointer_address' and 'radius'."}
+            try:
+                page_size, after=_read_page_request(query)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}
 
             # 1. Get the coordinates of the origin pointer. This is a single, fast lookup.
             cursor=self.db_manager.execute(
-                "SELECT x, y, z FROM pointers WHERE address = ?", (origin_pointer_address,))
+                _SQL_POINTER_COORDS, (origin_pointer_address,))
             origin_row=cursor.fetchone()
             if not origin_row:
                 return {"status": "error", "message": f"Origin pointer (SRL) not found: {origin_pointer_address}"}
             ox, oy, oz=origin_row
 
-            # 2. Perform a native mathematical search.
-            # This query calculates the squared Euclidean distance directly in the database,
-            # which is highly efficient. It avoids iterating through pointers in the application.
+            # 2. Perform a native spatial search.
             # We use squared distance to avoid the expensive SQRT() function in the DB.
-            radius_squared=float(radius) ** 2
             # This single query fetches all necessary data, removing the need for a loop.
-            cursor=self.db_manager.execute("""
-                SELECT address, description, data_reference, tags, connection_id, x, y, z, created_at, last_modified
-                FROM pointers
-                WHERE((x - ?) * (x - ?)) + ((y - ?) * (y - ?)) + ((z - ?) * (z - ?)) <= ?
-                AND address != ?
-            """, (ox, ox, oy, oy, oz, oz, radius_squared, origin_pointer_address))
-
-            rows=cursor.fetchall()
-            matching_pointers=[{
-                "address": row[0], "description": row[1], "data_reference": row[2],
-                "tags": json.loads(row[3]), "connection_id": row[4],
-                "x": row[5], "y": row[6], "z": row[7],
-                "created_at": row[8], "last_modified": row[9]
-            } for row in rows]
-
-            return {"status": "success", "result": {"count": len(matching_pointers), "pointers": matching_pointers}}
+            cursor=self._select_within_radius(
+                origin_pointer_address, (ox, oy, oz), float(radius), page=(*after, page_size + 1))
 
-    def _handle_get_graph_stats(self, query: dict) -> dict:
-            cursor=self.db_manager.execute("SELECT COUNT(*) FROM pointers")
-            num_pointers=cursor.fetchone()[0]
+            rows, next_cursor=_split_page(cursor.fetchall(), page_size)
+            matching_pointers=[_pointer_from_row(row) for row in rows]
 
-            # Count relationships by dividing the total rows in the relationships table by 2 (for bidirectional links)
-            cursor=self.db_manager.execute(
-                "SELECT COUNT(*) FROM relationships")
-            num_relationships=cursor.fetchone()[0] // 2
+            return {"status": "success", "result": {"count": len(matching_pointers), "pointers": matching_pointers, "next_cursor": next_cursor}}
+
+    def _handle_get_graph_stats(self, query: dict) -> dict:
+            # Both counts come back in one row. Relationships are counted as distinct unordered
+            # pairs, which stays correct even if a link was only stored in one direction.
+            cursor=self.db_manager.execute(_SQL_GRAPH_STATS)
+            num_pointers, num_relationships=cursor.fetchone()
 
             stats={
                 "total_pointers": num_pointers,
@@ -1275,50 +2090,44 @@ class PointerHelper:
                 return {"status": "error", "message": "Access denied. This action requires admin permissions."}
 
             domain_id=auth_context.get('domain_id')
+            # A single LEFT JOIN returns each domain together with its connections, so the overview
+            # is one query and one pass over the rows instead of a query per domain.
             cursor=self.db_manager.execute(
-                "SELECT id, name, created_at FROM domains WHERE id = ?", (domain_id,))
-            domain_row=cursor.fetchone()
-            domains=[{"id": domain_row[0], "name": domain_row[1],
-                "created_at": domain_row[2], "connections": []}] if domain_row else []
+                _SQL_ADMIN_OVERVIEW, (domain_id,))
 
-            domain_ids=[d['id'] for d in domains]
-            if not domain_ids:
-                return {"status": "success", "result": {"domains": []}}
-
-            # This part is complex to do without a loop in pure SQL without window functions or CTEs which might be complex.
-            # For now, this loop is acceptable as it's an admin function, not a core, high-frequency operation.
-            # A future optimization could be a more complex single query if performance becomes an issue.
-            # The logic remains the same.
+            domains_by_id={}
+            for row in cursor.fetchall():
+                domain=domains_by_id.get(row[0])
+                if domain is None:
+                    domain=domains_by_id[row[0]]={
+                        "id": row[0], "name": row[1], "created_at": row[2], "connections": []}
+                if row[3] is not None:
+                    domain["connections"].append({
+                        "id": row[3], "name": row[4], "description": row[5],
+                        "allow_writes": row[6], "status": row[7]})
+            domains=list(domains_by_id.values())
 
             return {"status": "success", "result": {"domains": domains}}
 
     def _handle_get_graph_dot(self, query: dict) -> dict:
-            # Start building the DOT language string. 'graph' for undirected edges.
-            dot_string='graph G {\n    node [shape=box, style="rounded,filled", fillcolor=lightyellow];\n'
-
-            # Keep track of edges to avoid duplicates in an undirected graph.
-            drawn_edges=set()
-
-            all_pointers_res=self.db_manager.execute(
-                "SELECT address, description FROM pointers").fetchall()
-            all_relationships_res=self.db_manager.execute(
-                "SELECT pointer_a_address, pointer_b_address, relationship, weight FROM relationships").fetchall()
-
-            for row in all_pointers_res:
-                address, description=row
-
-                # Add a node for each pointer.
-                description=description.replace(
-                    '"', '\\"') if description else address
-                dot_string += f'    "{address}" [label="{description}"];\n'
-
-            for row in all_relationships_res:
-                address, neighbor_address, relationship, weight=row
-                # Add edges for each neighbor relationship.
-
-                # To avoid duplicates, create a sorted tuple of the pair.
-                edge=tuple(sorted((address, neighbor_address)))
-                if edge not in drawn_edges:
+            # Collect the DOT language lines and join them once at the end; repeated string
+            # concatenation would copy the whole accumulator on every line. 'graph' for undirected edges.
+            parts=['graph G {', '    node [shape=box, style="rounded,filled", fillcolor=lightyellow];']
+
+            # Both result sets are streamed in batches rather than materialized whole.
+            cursor=self.db_manager.execute(_SQL_GRAPH_DOT_NODES)
+            while rows := cursor.fetchmany(_GRAPH_DOT_BATCH):
+                for address, description in rows:
+                    # Add a node for each pointer.
+                    description=description.replace(
+                        '"', '\\"') if description else address
+                    parts.append(f'    "{address}" [label="{description}"];')
+
+            # Duplicate edges of the undirected graph are already collapsed by the query.
+            cursor=self.db_manager.execute(_SQL_GRAPH_DOT_EDGES)
+            while rows := cursor.fetchmany(_GRAPH_DOT_BATCH):
+                for address, neighbor_address, relationship, weight, _ in rows:
+                    # Add edges for each neighbor relationship.
                     attributes=[]
                     if relationship:
                         attributes.append(
@@ -1326,14 +2135,12 @@ class PointerHelper:
                     if weight:
                         attributes.append(f'weight="{weight}"')
 
-                    dot_string += f'    "{address}" -- "{neighbor_address}" [{", ".join(attributes)}];\n'
-                    drawn_edges.add(edge)
-
-            dot_string += "}"
+                    parts.append(
+                        f'    "{address}" -- "{neighbor_address}" [{", ".join(attributes)}];')
 
             return {
                 "status": "success",
-                "result": {"dot_string": dot_string}
+                "result": {"dot_string": "\n".join(parts) + "\n}"}
             }
 
     def _handle_get_pointer_summary(self, query: dict) -> dict:
@@ -1342,18 +2149,18 @@ class PointerHelper:
                 return {"status": "error", "message": "Action 'get_pointer_summary' requires a 'pointer_address'."}
 
             cursor=self.db_manager.execute(
-                "SELECT description, tags, created_at, last_modified, connection_id, x, y, z FROM pointers WHERE address = ?", (pointer_address,))
+                _SQL_POINTER_SUMMARY, (pointer_address,))
             row=cursor.fetchone()
 
             if not row:
                 return {"status": "error", "message": f"Pointer (SRL) not found: {pointer_address}"}
 
             description, tags_json, created_at, last_modified, connection_id, x, y, z=row
-            tags=json.loads(tags_json)
+            tags=orjson.loads(tags_json)
 
             # Get neighbor count from the new table
             cursor=self.db_manager.execute(
-                "SELECT COUNT(*) FROM relationships WHERE pointer_a_address = ?", (pointer_address,))
+                _SQL_NEIGHBOR_COUNT, (pointer_address,))
             neighbor_count=cursor.fetchone()[0]
 
             summary={
@@ -1371,12 +2178,34 @@ class PointerHelper:
                 "result": summary
             }
 
+    def _fetch_pointer_with_proximity(self, pointer_address: str, radius: float) -> tuple:
+        """
+        Loads a pointer with its neighbors and the pointers within `radius` of it, for
+        internal callers that would otherwise dispatch get_pointer back through invoke.
+        Returns (pointer, nearby) where pointer is None if the address does not exist.
+        """
+        row=self.db_manager.execute(
+            _SQL_POINTER_BY_ADDRESS, (pointer_address,)).fetchone()
+        if not row:
+            return None, []
+        pointer=_pointer_from_row(row)
+        cursor=self.db_manager.execute(
+            _SQL_POINTER_NEIGHBORS, (pointer_address,))
+        pointer["neighbors"]=[
+            {"address": n[0], "relationship": n[1], "weight": n[2]} for n in cursor.fetchall()]
+        nearby=[]
+        if pointer["x"] is not None:
+            cursor=self._select_within_radius(
+                pointer_address, (pointer["x"], pointer["y"] or 0, pointer["z"] or 0), radius)
+            nearby=[{"address": n[0], "description": n[1]} for n in cursor.fetchall()]
+        return pointer, nearby
+
     def _handle_execute_creation_model(self, query: dict) -> dict:
             pointer_address=query.get("pointer_address")
             if not pointer_address:
                 return {"status": "error", "message": "Action 'execute_creation_model' requires a 'pointer_address'."}
 
-            op_id=f"op_{uuid.uuid4().hex[:8]}"
+            op_id=f"op_{secrets.token_hex(4)}"
             # --- Step 1: "Let there be Light" - The Invocation ---
             # The process begins with a single query, the initial spark.
             self.cycle_module.start_cycle(op_id)
@@ -1386,13 +2215,13 @@ class PointerHelper:
             # --- Step 2: "Let there be an Idea" - The Determination Graph ---
             # The "idea" is the pointer itself and its immediate context (neighbors).
             # This is the first "vertical" step, adding/multiplying context.
-            graph_response=self.invoke(
-                {"action": "get_pointer", "pointer_address": pointer_address})
+            # The step 5 proximity set is loaded in the same pass.
+            root_pointer, nearby_pointers=self._fetch_pointer_with_proximity(
+                pointer_address, 5.0)
             determination_graph={
-                "root": graph_response.get("result"),
-                "neighbors": graph_response.get("result", {}).get("neighbors", [])
+                "root": root_pointer,
+                "neighbors": root_pointer["neighbors"] if root_pointer else []
             }
-            root_pointer=determination_graph["root"]
             self.cycle_module.advance_cycle(op_id)
             self.audit_module.log(
                 "creation_model_step2", f"Determined local graph for {pointer_address}.")
@@ -1432,17 +2261,7 @@ class PointerHelper:
             proximity_results=[]
             # Ensure coordinates exist
             if root_pointer and root_pointer.get('x') is not None:
-                ox, oy, oz=root_pointer.get('x', 0), root_pointer.get(
-                    'y', 0), root_pointer.get('z', 0)
-                radius_squared=5.0 ** 2                
-                cursor=self.db_manager.execute("""
-                    SELECT address, description FROM pointers
-                    WHERE((x - ?) * (x - ?)) + ((y - ?) * (y - ?)) + ((z - ?) * (z - ?)) <= ?
-                    AND address != ?
-                """, (ox, ox, oy, oy, oz, oz, radius_squared, pointer_address))
-                for row in cursor.fetchall():
-                    proximity_results.append(
-                        {"address": row[0], "description": row[1]})
+                proximity_results=nearby_pointers
                 self.cycle_module.advance_cycle(op_id)
                 self.audit_module.log(
                     "creation_model_step5", f"Proximity analysis found {len(proximity_results)} nearby pointers for {pointer_address}.")
@@ -1467,6 +2286,7 @@ class PointerHelper:
             # --- Step 7: Self-Reflection and Reset ---
             # The cycle completes, knowledge is logged, and gravitates back to 1.
             cycle_end_status=self.cycle_module.advance_cycle(op_id)
+            self.cycle_module.end_cycle(op_id)
             final_render={
                 "status": "creation_model_complete",
                 "result": presentation_data,
@@ -1495,14 +2315,13 @@ class PointerHelper:
                     "data_reference": circuit_data_reference,
                     "description": shortcut_description
                 }
-                create_response=self.invoke(shortcut_query)
+                create_response=self._handle_create_pointer(shortcut_query)
                 final_render["result"]["shortcut_pointer_address"]=create_response.get(
                     "result", {}).get("pointer", {}).get("address")
 
             return final_render
 
-    def _handle_unrefactored_action(self, query: dict) -> dict:
-        if query.get("action") == "clear_audit_log":
+    def _handle_clear_audit_log(self, query: dict) -> dict:
             auth_context=query.get("auth_context", {})  # From JWT
 
             # This action is now scoped to the domain of the admin key.
@@ -1513,39 +2332,31 @@ class PointerHelper:
             key_str=f"key ending in ...{auth_context.get('key', 'unknown')[-4:]}"
 
             try:
+                # Write out anything still queued so it cannot land after the clear.
+                self.audit_module.flush()
                 self.db_manager.execute("DELETE FROM audit_log")
-                self.audit_module.commit()
-                # Log the clear action itself as the first new entry
+                # Log the clear action itself as the first new entry, in the same transaction
                 self.audit_module.log(
-                    "clear_audit_log", f"Audit log cleared by admin key '{key_str}'.")
+                    "clear_audit_log", f"Audit log cleared by admin key '{key_str}'.", durable=True)
+                self.audit_module.commit()
                 return {"status": "success", "result": {"message": "Audit log has been cleared."}}
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while clearing the audit log: {str(e)}"}
 
-        elif query.get("action") == "get_all_tags":
+    def _handle_get_all_tags(self, query: dict) -> dict:
             try:
-                cursor=self.db_manager.execute("SELECT tags FROM pointers")
-                rows=cursor.fetchall()
-
-                all_tags=set()
-                for row in rows:
-                    if row[0]:  # Ensure the tags column is not null
-                        try:
-                            tags_list=json.loads(row[0])
-                            if isinstance(tags_list, list):
-                                all_tags.update(tags_list)
-                        except (json.JSONDecodeError, TypeError):
-                            # Ignore malformed JSON in the tags column for this row
-                            continue
-
-                sorted_tags=sorted(list(all_tags))
+                # pointer_tags is kept in sync by triggers, so the unique, sorted tag list comes
+                # straight off the tag index with no JSON decoding in Python.
+                cursor=self.db_manager.execute(
+                    "SELECT DISTINCT tag FROM pointer_tags ORDER BY tag")
+                sorted_tags=[row[0] for row in cursor.fetchall()]
                 self.audit_module.log(
                     "get_all_tags", f"Retrieved {len(sorted_tags)} unique tags.")
                 return {"status": "success", "result": {"tags": sorted_tags}}
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching tags: {str(e)}"}
 
-        elif query.get("action") == "get_unassigned_pointers":
+    def _handle_get_unassigned_pointers(self, query: dict) -> dict:
             # This is an administrative action. Check for admin privileges.
             auth_context=query.get("auth_context", {})
             if 'admin_domain' not in auth_context.get('permissions', []):
@@ -1565,34 +2376,23 @@ class PointerHelper:
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching unassigned pointers: {str(e)}"}
 
-        elif query.get("action") == "get_available_apis":
+    def _handle_get_available_apis(self, query: dict) -> dict:
             try:
-                edition=os.environ.get(
-                    'BUTTERFLY_EDITION', 'COMMUNITY').upper()
-                # The _get_predefined_api method is designed to get a single API.
-                # We can introspect it to build the full list.
-                # This is a simplified way to get the source dictionaries.
-                # This will be the full dict for the edition
-                all_apis=self._get_predefined_api(None)
-
-                # Format for client consumption
-                available_apis=[{"api_type": key, "description": value["description"]}
-                    for key, value in all_apis.items()]
-
-                return {"status": "success", "result": {"edition": edition, "available_apis": available_apis}}
+                edition=_current_edition()
+                # Formatted for client consumption and memoized per edition.
+                return {"status": "success", "result": {"edition": edition, "available_apis": _available_apis_for(edition)}}
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching available APIs: {str(e)}"}
 
-        elif query.get("action") == "find_pointers_by_tag":
+    def _handle_find_pointers_by_tag(self, query: dict) -> dict:
             tag=query.get("tag")
             if not tag:
                 return {"status": "error", "message": "Action 'find_pointers_by_tag' requires a 'tag'."}
 
             try:
-                # Use LIKE to find the tag within the JSON array string
-                # The quotes ensure we match the whole tag string, e.g., "user_data"
-                cursor=self.db_manager.execute(
-                    "SELECT address, description, created_at FROM pointers WHERE tags LIKE ?", (f'%"{tag}"%',))
+                # Exact tag match through the tag index, so the cost follows the number of
+                # matches rather than the size of the pointers table.
+                cursor=self.db_manager.execute(_SQL_POINTERS_BY_TAG, (tag,))
                 rows=cursor.fetchall()
 
                 matching_pointers=[
@@ -1604,27 +2404,28 @@ class PointerHelper:
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while finding pointers by tag: {str(e)}"}
 
-        elif query.get("action") == "get_pointer_relationships":
+    def _handle_get_pointer_relationships(self, query: dict) -> dict:
             pointer_address=query.get("pointer_address")
             if not pointer_address:
                 return {"status": "error", "message": "Action 'get_pointer_relationships' requires a 'pointer_address'."}
 
             try:
-                # Use DISTINCT to get a unique list of relationship types for the pointer
-                cursor=self.db_manager.execute(
-                    "SELECT DISTINCT relationship FROM relationships WHERE pointer_a_address = ?", (pointer_address,))
-                rows=cursor.fetchall()
-
-                # Extract the relationship strings from the query result
-                relationship_types=[row[0] for row in rows if row[0]]
+                # The unique, sorted, non-empty relationship types for the pointer, read in order
+                # straight off idx_relationships_a_type. `<> ''` also excludes NULL.
+                cursor=self.db_manager.execute("""
+                    SELECT relationship FROM relationships
+                    WHERE pointer_a_address = ? AND relationship <> ''
+                    GROUP BY relationship ORDER BY relationship
+                """, (pointer_address,))
+                relationship_types=[row[0] for row in cursor.fetchall()]
 
                 self.audit_module.log(
                     "get_pointer_relationships", f"Found {len(relationship_types)} unique relationship types for pointer '{pointer_address}'.")
-                return {"status": "success", "result": {"relationships": sorted(relationship_types)}}
+                return {"status": "success", "result": {"relationships": relationship_types}}
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching pointer relationships: {str(e)}"}
 
-        elif query.get("action") == "get_isolated_pointers":
+    def _handle_get_isolated_pointers(self, query: dict) -> dict:
             # This is an administrative action. Check for admin privileges.
             auth_context=query.get("auth_context", {})  # From JWT
             # We check for the specific 'admin_domain' permission.
@@ -1632,12 +2433,12 @@ class PointerHelper:
                 return {"status": "error", "message": "Access denied. This action requires administrative privileges."}
 
             try:
-                # Use a LEFT JOIN to find pointers that have no entries in the relationships table.
+                # An anti-join: one primary-key prefix probe into relationships per pointer,
+                # stopping at the first match, instead of joining every relationship row.
                 cursor=self.db_manager.execute("""
                     SELECT p.address, p.description, p.created_at
                     FROM pointers p
-                    LEFT JOIN relationships r ON p.address=r.pointer_a_address
-                    WHERE r.pointer_a_address IS NULL
+                    WHERE NOT EXISTS (SELECT 1 FROM relationships r WHERE r.pointer_a_address = p.address)
                 """)
                 rows=cursor.fetchall()
                 isolated_pointers=[
@@ -1648,7 +2449,7 @@ class PointerHelper:
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching isolated pointers: {str(e)}"}
 
-        elif query.get("action") == "get_relationships_by_type":
+    def _handle_get_relationships_by_type(self, query: dict) -> dict:
             relationship_type=query.get("relationship_type")
             if not relationship_type:
                 return {"status": "error", "message": "Action 'get_relationships_by_type' requires a 'relationship_type'."}
@@ -1656,7 +2457,7 @@ class PointerHelper:
             try:
                 # Query for relationships of a specific type.
                 # The pointer_a_address < pointer_b_address condition prevents duplicates from the bidirectional links.
-                rows=self.db_manager.execute(
+                cursor=self.db_manager.execute(
                     "SELECT pointer_a_address, pointer_b_address, weight FROM relationships WHERE relationship = ? AND pointer_a_address < pointer_b_address", (relationship_type,))
                 rows=cursor.fetchall()
 
@@ -1669,10 +2470,6 @@ class PointerHelper:
             except Exception as e:
                 return {"status": "error", "message": f"An error occurred while fetching relationships by type: {str(e)}"}
 
-        else:
-            return {"status": "error", "message": f"Unknown action: '{query.get('action')}'"}
-
-
 # --- Flask Web Server Setup ---
 # This provides the API endpoint for applications to interact with the PointerHelper.
 app=Flask(__name__)
@@ -1684,9 +2481,17 @@ CORS(app)
 butterfly_helper=None  # Will be initialized after config is loaded
 
 # --- Caching for Report Endpoint ---
-_report_cache={}
 # Cache reports for 5 minutes. A real implementation detail.
 CACHE_TTL_SECONDS=300
+_report_cache=_TTLCache(maxsize=256, ttl=CACHE_TTL_SECONDS)
+# One lock per report type, so concurrent misses for the same type wait for a single
+# upstream fetch instead of all issuing their own. Keys are limited to the API catalogue.
+_report_fetch_locks: dict[str, threading.Lock]={}
+# The upstream ETag / Last-Modified of each report, with the report itself, kept well past
+# CACHE_TTL_SECONDS. An expired report is revalidated with a conditional GET, and a 304
+# puts the stored report back in the cache without downloading or parsing it again.
+REPORT_VALIDATOR_TTL_SECONDS=24 * 60 * 60
+_report_validators=_TTLCache(maxsize=256, ttl=REPORT_VALIDATOR_TTL_SECONDS)
 
 # --- JWT Authentication Setup ---
 
@@ -1694,6 +2499,104 @@ CACHE_TTL_SECONDS=300
 app.config['SECRET_KEY']=os.environ.get(
     'JWT_SECRET_KEY', 'default-super-secret-key-for-dev')
 
+# Opt-in HS256 verifier built on hmac/hashlib (OpenSSL) and orjson. PyJWT stays the default;
+# set BUTTERFLY_FAST_JWT=1 to use this one. It raises PyJWT's exception types, so callers
+# handle both paths the same way.
+FAST_JWT=os.environ.get('BUTTERFLY_FAST_JWT', '').lower() in ('1', 'true', 'yes')
+
+
+def _b64url_decode(segment: str) -> bytes:
+    return base64.urlsafe_b64decode(segment + '=' * (-len(segment) % 4))
+
+
+def _decode_hs256(token: str, secret: str, require: tuple=()) -> dict:
+    """
+    Verifies an HS256 token, the presence of the `require` claims, and its exp/nbf/iat
+    claims the way jwt.decode does (no leeway).
+    """
+    try:
+        header_b64, payload_b64, signature_b64=token.split('.')
+        signing_input=f"{header_b64}.{payload_b64}".encode('ascii')
+        header=orjson.loads(_b64url_decode(header_b64))
+        signature=_b64url_decode(signature_b64)
+        payload_bytes=_b64url_decode(payload_b64)
+    except (ValueError, orjson.JSONDecodeError):
+        # binascii.Error and UnicodeEncodeError are both ValueErrors.
+        raise jwt.DecodeError("Invalid token encoding") from None
+    if not isinstance(header, dict):
+        raise jwt.DecodeError("Invalid header string: must be a json object")
+    if header.get('alg') != 'HS256':
+        raise jwt.InvalidAlgorithmError("The specified alg value is not allowed")
+    expected=hmac.new(secret.encode('utf-8'), signing_input, hashlib.sha256).digest()
+    if not hmac.compare_digest(expected, signature):
+        raise jwt.InvalidSignatureError("Signature verification failed")
+    # Like PyJWT, the payload JSON is only parsed once the signature has been verified.
+    try:
+        payload=orjson.loads(payload_bytes)
+    except orjson.JSONDecodeError:
+        raise jwt.DecodeError("Invalid payload string") from None
+    if not isinstance(payload, dict):
+        raise jwt.DecodeError("Invalid payload string: must be a json object")
+    for claim in require:
+        if claim not in payload:
+            raise jwt.MissingRequiredClaimError(claim)
+
+    now=time.time()
+    if 'exp' in payload:
+        try:
+            exp=int(payload['exp'])
+        except (ValueError, TypeError, OverflowError):
+            raise jwt.DecodeError("Expiration Time claim (exp) must be an integer.") from None
+        if exp <= now:
+            raise jwt.ExpiredSignatureError("Signature has expired")
+    if 'nbf' in payload:
+        try:
+            nbf=int(payload['nbf'])
+        except (ValueError, TypeError, OverflowError):
+            raise jwt.DecodeError("Not Before claim (nbf) must be an integer.") from None
+        if nbf > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (nbf)")
+    if 'iat' in payload:
+        try:
+            iat=int(payload['iat'])
+        except (ValueError, TypeError, OverflowError):
+            raise jwt.InvalidIssuedAtError("Issued At claim (iat) must be an integer.") from None
+        if iat > now:
+            raise jwt.ImmatureSignatureError("The token is not yet valid (iat)")
+    return payload
+
+
+# Claims every bearer token must carry; checked while decoding.
+_REQUIRED_CLAIMS=("access_key",)
+
+# Verified token payloads, keyed by the raw token. An entry never outlives the token's own
+# `exp`, so an expired token is always re-decoded and rejected by PyJWT.
+TOKEN_CACHE_SECONDS=60
+_token_cache=_TTLCache(maxsize=4096, ttl=TOKEN_CACHE_SECONDS)
+
+
+def _decode_token(token: str) -> dict:
+    """Verifies and decodes a bearer token, reusing the result for repeat requests."""
+    payload=_token_cache.get(token)
+    if payload is None:
+        if FAST_JWT:
+            payload=_decode_hs256(token, app.config['SECRET_KEY'], require=_REQUIRED_CLAIMS)
+        else:
+            payload=jwt.decode(
+                token, app.config['SECRET_KEY'], algorithms=["HS256"],
+                options={"require": list(_REQUIRED_CLAIMS)})
+        ttl=TOKEN_CACHE_SECONDS
+        if 'exp' in payload:
+            # Coerced the way the verifiers read it, which accepts e.g. a numeric string.
+            try:
+                ttl=min(ttl, int(payload['exp']) - time.time())
+            except (ValueError, TypeError, OverflowError):
+                ttl=0  # Not cached.
+        if ttl > 0:
+            _token_cache.set(token, payload, ttl)
+    # Callers add request-specific fields, so never hand out the cached dict itself.
+    return dict(payload)
+
 
 def token_required(f):
     @ wraps(f)
@@ -1717,11 +2620,8 @@ def token_required(f):
 
         try:
             # Decode the token using the app's secret key
-            payload=jwt.decode(
-                token, app.config['SECRET_KEY'], algorithms=["HS256"])
-            access_key=payload.get('access_key')
-            if not access_key:
-                return jsonify({'message': 'Token is invalid! Missing access_key.'}), 401
+            payload=_decode_token(token)
+            access_key=payload['access_key']
 
             # Verify the access key and get its context (domain, permissions)
             cursor=butterfly_helper.audit_module.db_manager.execute(
@@ -1737,6 +2637,8 @@ def token_required(f):
                 'key': access_key, 'domain_id': domain_id, 'permissions': permissions_list}
         except jwt.ExpiredSignatureError:
             return jsonify({'message': 'Token has expired!'}), 401
+        except jwt.MissingRequiredClaimError:
+            return jsonify({'message': 'Token is invalid! Missing access_key.'}), 401
         except jwt.InvalidTokenError as e:
             return jsonify({'message': 'Token is invalid!', 'error': str(e)}), 401
 
@@ -1748,17 +2650,23 @@ def token_required(f):
 @ token_required
 # token_payload is now passed from the decorator
 def handle_invocation(token_payload):
-    encrypted_query_str=request.data.decode('utf-8')
+    encryption_module=butterfly_helper.encryption_module
+    encrypted_query=request.get_data()
+    # Binary clients send the Fernet token without its base64 layer and get the
+    # response back the same way; text/plain keeps the original base64 format.
+    if request.mimetype == 'application/octet-stream':
+        encrypt, decrypt, content_type=encryption_module.encrypt_raw, encryption_module.decrypt_raw, 'application/octet-stream'
+    else:
+        encrypt, decrypt, content_type=encryption_module.encrypt, encryption_module.decrypt, 'text/plain'
     try:
-        query=butterfly_helper.encryption_module.decrypt(encrypted_query_str)
+        query=decrypt(encrypted_query)
         # Inject the auth context from the token into the query for permission checks
         query['auth_context']=token_payload.get('auth_context')
         response=butterfly_helper.invoke(query)
-        encrypted_response=butterfly_helper.encryption_module.encrypt(
-            response)
-        return encrypted_response, 200, {'Content-Type': 'text/plain'}
+        encrypted_response=encrypt(response)
+        return encrypted_response, 200, {'Content-Type': content_type}
     except Exception as e:
-        return butterfly_helper.encryption_module.encrypt({"status": "error", "message": f"Failed to process encrypted request: {str(e)}"}), 400, {'Content-Type': 'text/plain'}
+        return encrypt({"status": "error", "message": f"Failed to process encrypted request: {str(e)}"}), 400, {'Content-Type': content_type}
 
 
 @ app.route('/capabilities', methods=['GET'])
@@ -1780,30 +2688,50 @@ def generate_report():
         return jsonify({"error": "API type parameter is missing"}), 400
 
     # Check cache first
-    current_time=time.time()
-    if api_type in _report_cache and (current_time - _report_cache[api_type]['timestamp']) < CACHE_TTL_SECONDS:
-        print(f"[*] Serving report for '{api_type}' from cache.")
-        return jsonify(_report_cache[api_type]['data'])
+    report_data=_report_cache.get(api_type)
+    if report_data is not None:
+        logger.debug("Serving report for '%s' from cache.", api_type)
+        return jsonify(report_data)
 
-    print(
-        f"[*] Generating new report for '{api_type}'. Cache miss or expired.")
     api_info=butterfly_helper._get_predefined_api(api_type)
     if not api_info:
         return jsonify({"error": "Invalid API type"}), 404
 
-    try:
-        response=requests.get(api_info['data_reference'], timeout=10)
-        response.raise_for_status()
-        data_payload=response.json()
-        report_data={"source": api_info['description'], "data": data_payload}
+    with _report_fetch_locks.setdefault(api_type, threading.Lock()):
+        # Another request may have filled the cache while this one waited for the lock.
+        report_data=_report_cache.get(api_type)
+        if report_data is not None:
+            return jsonify(report_data)
+
+        logger.info(
+            "Generating new report for '%s'. Cache miss or expired.", api_type)
+        headers={}
+        validators=_report_validators.get(api_type)
+        if validators is not None:
+            etag, last_modified, _=validators
+            if etag:
+                headers['If-None-Match']=etag
+            if last_modified:
+                headers['If-Modified-Since']=last_modified
+        try:
+            with _http_session.get(api_info['data_reference'], headers=headers,
+                                   timeout=HTTP_TIMEOUT, stream=True) as response:
+                if response.status_code == 304 and validators is not None:
+                    # Unchanged upstream: the stored report is still current.
+                    report_data=validators[2]
+                else:
+                    response.raise_for_status()
+                    data_payload=json.loads(_read_capped_body(response))
+                    report_data={"source": api_info['description'], "data": data_payload}
+                    _report_validators.set(api_type, (
+                        response.headers.get('ETag'), response.headers.get('Last-Modified'), report_data))
 
-
-        # Store the new report in the cache
-        _report_cache[api_type]={
-            'timestamp': current_time, 'data': report_data}
-        return jsonify(report_data)
-    except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
-        return jsonify({"error": f"Failed to fetch or parse data from API: {str(e)}"})
+            # Store the new report in the cache
+            _report_cache.set(api_type, report_data)
+            return jsonify(report_data)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            # ValueError covers both malformed JSON and a body over MAX_FETCH_BYTES.
+            return jsonify({"error": f"Failed to fetch or parse data from API: {str(e)}"})
 
 
 @ app.route('/')
@@ -1820,7 +2748,7 @@ def subscribe():
         return "Email address is required.", 400
 
     try:
-        timestamp=datetime.now(timezone.utc).isoformat()
+        timestamp=_utcnow_iso()
         butterfly_helper.audit_module.db_manager.execute("INSERT INTO mailing_list (email, subscribed_at) VALUES (?, ?)",
                        (email, timestamp))
         butterfly_helper.audit_module.commit()
@@ -1888,6 +2816,11 @@ def load_config():
 
 def main():
 
+    # Log INFO and above by default; set BUTTERFLY_LOG_LEVEL=DEBUG to see every invocation.
+    logging.basicConfig(
+        level=os.environ.get('BUTTERFLY_LOG_LEVEL', 'INFO').upper(),
+        format="%(asctime)s %(levelname)s [%(name)s] %(message)s")
+
     # Load config or run wizard before initializing the helper
     global _config, butterfly_helper
     _config = load_config()
@@ -1899,7 +2832,10 @@ def main():
     print("Starting Butterfly server...")
     # In a production Docker environment, gunicorn would be used. This is for local dev.
     # debug=False for production-like behavior.
-    app.run(host='0.0.0.0', port=5001, debug=False)
+    try:
+        app.run(host='0.0.0.0', port=5001, debug=False)
+    finally:
+        butterfly_helper.close()
 
 
   
\ No newline at end of file
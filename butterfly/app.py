@@ -1,6 +1,6 @@
 from flask import Flask, jsonify, request
+import io
 import random
-import time
 
 app = Flask(__name__)
 
@@ -8,48 +8,57 @@ app = Flask(__name__)
 class RPGSimulation:
     """Handles the logic for the RPG simulation."""
 
-    def __init__(self):
-        self.log = []
+    def __init__(self, seed=None):
+        self._buf = io.StringIO()
+        # A generator per simulation instead of the shared module-level one; a seed
+        # makes a run reproducible.
+        self._rng = random.Random(seed)
         self.events = {
             "monster": self._monster_event,
             "treasure": self._treasure_event,
             "trap": self._trap_event,
         }
+        self.event_types = list(self.events)
+
+    def _log(self, line: str):
+        """Appends one line to the simulation output."""
+        self._buf.write(line)
+        self._buf.write("\n")
 
     def _monster_event(self):
-        monster = random.choice(["Goblin", "Orc", "Slime"])
-        self.log.append(f"A wild {monster} appears!")
-        action = random.choice(["attacks", "casts a spell on"])
-        self.log.append(f"The hero {action} the {monster}.")
-        if random.random() > 0.3:
-            self.log.append(f"The {monster} is defeated!")
+        monster = self._rng.choice(["Goblin", "Orc", "Slime"])
+        self._log(f"A wild {monster} appears!")
+        action = self._rng.choice(["attacks", "casts a spell on"])
+        self._log(f"The hero {action} the {monster}.")
+        if self._rng.random() > 0.3:
+            self._log(f"The {monster} is defeated!")
         else:
-            self.log.append(f"The {monster} evades the attack!")
+            self._log(f"The {monster} evades the attack!")
 
     def _treasure_event(self):
-        item = random.choice(
+        item = self._rng.choice(
             ["a healing potion", "a shiny sword", "an old map"])
-        self.log.append(f"The hero finds a treasure chest containing {item}!")
+        self._log(f"The hero finds a treasure chest containing {item}!")
 
     def _trap_event(self):
-        trap = random.choice(["a pitfall", "a poison dart", "a magical curse"])
-        self.log.append(
+        trap = self._rng.choice(["a pitfall", "a poison dart", "a magical curse"])
+        self._log(
             f"The hero encounters {trap} but skillfully avoids it.")
 
     def run(self, turns: int) -> str:
         """Runs the simulation for a given number of turns."""
-        self.log.append("⚔️ Welcome to the AI-Powered RPG Arena! ⚔️\n")
-        self.log.append("The simulation is starting...")
-        time.sleep(1)  # Simulate a short delay for effect
+        self._log("⚔️ Welcome to the AI-Powered RPG Arena! ⚔️\n")
+        self._log("The simulation is starting...")
 
-        for i in range(1, turns + 1):
-            self.log.append(f"\n--- Turn {i} ---")
-            event_type = random.choice(list(self.events.keys()))
+        # The whole log is returned in one response, so the turns run back to back;
+        # all event types are drawn up front in a single call.
+        event_types = self._rng.choices(self.event_types, k=turns)
+        for i, event_type in enumerate(event_types, start=1):
+            self._log(f"\n--- Turn {i} ---")
             self.events[event_type]()
-            time.sleep(0.5)  # Simulate processing for each turn
 
-        self.log.append("\n\n--- Simulation Complete ---")
-        return "\n".join(self.log)
+        self._buf.write("\n\n--- Simulation Complete ---")
+        return self._buf.getvalue()
 
 
 def run_rpg_simulation(turns: int) -> str:
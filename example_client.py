@@ -1,9 +1,27 @@
 import requests
-import jwt
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from jwt.algorithms import HMACAlgorithm
+import base64
 import json
+import orjson
 import os
-from datetime import datetime, timedelta, timezone
-from cryptography.fernet import Fernet
+import time
+from _fernet import get_fernet, get_raw_fernet
+
+TOKEN_LIFETIME_SECONDS = 3600  # Token expires in 1 hour
+TOKEN_REFRESH_SECONDS = 60  # Re-sign this long before expiry
+# Send Fernet tokens as raw bytes (application/octet-stream) instead of base64 text.
+# Set BUTTERFLY_RAW_TRANSPORT=0 to talk to servers that only accept text/plain.
+RAW_TRANSPORT = os.environ.get('BUTTERFLY_RAW_TRANSPORT', '1') != '0'
+
+
+def _b64url(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b'=')
+
+
+# The JOSE header is the same for every token, so it is encoded once.
+_JWT_HEADER_SEGMENT = _b64url(orjson.dumps({'alg': 'HS256', 'typ': 'JWT'}))
 
 
 class ButterflyClient:
@@ -11,34 +29,52 @@ class ButterflyClient:
     An example client for demonstrating how to interact with the Butterfly System API.
     """
 
-    def __init__(self, base_url, app_id, jwt_secret, encryption_key):
+    def __init__(self, base_url, app_id, jwt_secret, encryption_key, raw_transport=RAW_TRANSPORT):
         if not all([base_url, app_id, jwt_secret, encryption_key]):
             raise ValueError("All initialization parameters are required.")
         self.base_url = base_url
         self.app_id = app_id
         self.jwt_secret = jwt_secret
-        self.fernet = Fernet(encryption_key)
+        self.raw_transport = raw_transport
+        self.fernet = get_raw_fernet(encryption_key) if raw_transport else get_fernet(encryption_key)
+        self.content_type = 'application/octet-stream' if raw_transport else 'text/plain'
+        # HS256 signer and key prepared once; produces the same tokens as jwt.encode.
+        self._signer = HMACAlgorithm(HMACAlgorithm.SHA256)
+        self._signing_key = self._signer.prepare_key(jwt_secret)
+        self._cached_token = None
+        self._token_exp = 0
+        # Keep-Alive session so repeated invocations reuse the same socket.
+        # For high-volume async callers, httpx.AsyncClient with
+        # httpx.Limits(max_connections=100, max_keepalive_connections=20) is the equivalent.
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                              max_retries=Retry(total=2, backoff_factor=0.1))
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
 
     def _generate_token(self):
-        """Generates a JWT token for the configured app_id."""
-        payload = {
-            'app_id': self.app_id,
-            'exp': datetime.now(timezone.utc) + timedelta(hours=1)  # Token expires in 1 hour
-        }
-        token = jwt.encode(payload, self.jwt_secret, algorithm="HS256")
+        """
+        Returns a JWT token for the configured app_id, reusing the cached one
+        until it is within TOKEN_REFRESH_SECONDS of expiring.
+        """
+        if self._cached_token and self._token_exp - time.time() > TOKEN_REFRESH_SECONDS:
+            return self._cached_token
+        exp = int(time.time()) + TOKEN_LIFETIME_SECONDS
+        signing_input = _JWT_HEADER_SEGMENT + b'.' + _b64url(orjson.dumps({'app_id': self.app_id, 'exp': exp}))
+        token = (signing_input + b'.' + _b64url(self._signer.sign(signing_input, self._signing_key))).decode('ascii')
+        self._cached_token = token
+        self._token_exp = exp
         print(f"[*] Generated JWT for app_id: {self.app_id}")
         return token
 
-    def encrypt_query(self, query: dict) -> str:
-        """Encrypts a query dictionary into a secure string."""
-        json_string = json.dumps(query)
-        encrypted_message = self.fernet.encrypt(json_string.encode('utf-8'))
-        return encrypted_message.decode('utf-8')
+    def encrypt_query(self, query: dict) -> bytes:
+        """Encrypts a query dictionary into a secure request body."""
+        return self.fernet.encrypt(orjson.dumps(query))
 
-    def decrypt_response(self, encrypted_str: str) -> dict:
-        """Decrypts a secure response string back into a dictionary."""
-        decrypted_message = self.fernet.decrypt(encrypted_str.encode('utf-8'))
-        return json.loads(decrypted_message.decode('utf-8'))
+    def decrypt_response(self, encrypted_body: bytes) -> dict:
+        """Decrypts a secure response body back into a dictionary."""
+        decrypted_message = self.fernet.decrypt(encrypted_body)
+        return orjson.loads(decrypted_message)
 
     def invoke(self, query: dict):
         """
@@ -48,7 +84,7 @@ class ButterflyClient:
         token = self._generate_token()
         headers = {
             'Authorization': f'Bearer {token}',
-            'Content-Type': 'text/plain'
+            'Content-Type': self.content_type
         }
 
         print(f"\n[*] Encrypting query: {query}")
@@ -56,11 +92,11 @@ class ButterflyClient:
 
         print(f"[*] Sending encrypted request to {self.base_url}/invoke")
         try:
-            response = requests.post(f"{self.base_url}/invoke", data=encrypted_query, headers=headers, timeout=10)
+            response = self._session.post(f"{self.base_url}/invoke", data=encrypted_query, headers=headers, timeout=10)
             response.raise_for_status()
 
             print("[*] Received encrypted response. Decrypting...")
-            decrypted_response = self.decrypt_response(response.text)
+            decrypted_response = self.decrypt_response(response.content)
             return decrypted_response
 
         except requests.exceptions.RequestException as e:
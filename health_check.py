@@ -1,14 +1,34 @@
 import requests
 import sys
 import os
-import json
-import jwt
-from cryptography.fernet import Fernet
-from datetime import datetime, timedelta, timezone
+import orjson
+import time
 
 # --- Configuration ---
 BASE_URL = "http://localhost:5001"
 APP_ID = "health-check-app"
+TOKEN_LIFETIME_SECONDS = 300  # exp claim of the readiness token
+TOKEN_REUSE_SECONDS = 240  # Probes share one token this long, so the server's token cache can serve it
+# The readiness query never changes, so it is kept pre-serialized.
+_READY_QUERY_JSON = b'{"action": "get_graph_stats"}'
+
+# The readiness token is reused across checks for TOKEN_REUSE_SECONDS.
+_token = None
+_token_secret = None
+_token_issued_at = 0
+
+# Shared session so the liveness and readiness probes reuse one connection.
+_SESSION = requests.Session()
+
+def _get_token(jwt_secret):
+    import jwt
+    global _token, _token_secret, _token_issued_at
+    now = int(time.time())
+    if _token is None or _token_secret != jwt_secret or now - _token_issued_at >= TOKEN_REUSE_SECONDS:
+        _token = jwt.encode({'app_id': APP_ID, 'exp': now + TOKEN_LIFETIME_SECONDS}, jwt_secret, algorithm="HS256")
+        _token_secret = jwt_secret
+        _token_issued_at = now
+    return _token
 
 def check_liveness(url):
     """
@@ -17,7 +37,7 @@ def check_liveness(url):
     """
     print(f"[*] Performing Liveness Check on {url}...")
     try:
-        response = requests.get(url, timeout=5)
+        response = _SESSION.get(url, timeout=5)
         if response.status_code == 200:
             print("[+] Liveness Check PASSED: Service is up and responding.")
             return True
@@ -39,30 +59,27 @@ def check_readiness(url, jwt_secret, encryption_key):
         return False
 
     try:
-        fernet = Fernet(encryption_key)
+        # jwt and cryptography are only needed here, so a liveness-only run never loads them.
+        from _fernet import get_fernet
+        fernet = get_fernet(encryption_key)
 
-        # 1. Generate Token
-        token_payload = {
-            'app_id': APP_ID,
-            'exp': datetime.now(timezone.utc) + timedelta(minutes=5)
-        }
-        token = jwt.encode(token_payload, jwt_secret, algorithm="HS256")
+        # 1. Generate Token (cached until close to expiry)
+        token = _get_token(jwt_secret)
 
-        # 2. Encrypt Query
-        query = {"action": "get_graph_stats"}
-        encrypted_query = fernet.encrypt(json.dumps(query).encode()).decode()
+        # 2. Encrypt Query (a fresh IV each time, so only the plaintext is cached)
+        encrypted_query = fernet.encrypt(_READY_QUERY_JSON)
 
         # 3. Make Request
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'text/plain'
         }
-        response = requests.post(f"{url}/invoke", data=encrypted_query, headers=headers, timeout=10)
+        response = _SESSION.post(f"{url}/invoke", data=encrypted_query, headers=headers, timeout=10)
         response.raise_for_status()
 
         # 4. Decrypt and Verify Response
-        decrypted_response_data = fernet.decrypt(response.text.encode())
-        result = json.loads(decrypted_response_data)
+        decrypted_response_data = fernet.decrypt(response.content)
+        result = orjson.loads(decrypted_response_data)
 
         if result.get("status") == "success":
             print("[+] Readiness Check PASSED: API invocation was successful.")
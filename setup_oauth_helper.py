@@ -1,7 +1,6 @@
 import json
 import os
-import textwrap
-from cryptography.fernet import Fernet
+import orjson
 
 
 PROVIDERS = {
@@ -83,6 +82,8 @@ def get_credentials_and_generate_pointer(provider_key):
         print("    This key is required to encrypt your secrets. Please set it and run the script again.")
         return
 
+    # Imported here so cryptography only loads once the user has entered their secrets.
+    from _fernet import Fernet
     fernet = Fernet(encryption_key_str.encode())
 
     # This is the sensitive data that will be encrypted
@@ -95,7 +96,7 @@ def get_credentials_and_generate_pointer(provider_key):
         "scopes": provider['scopes']
     }
 
-    encrypted_config = fernet.encrypt(json.dumps(oauth_config).encode()).decode()
+    encrypted_config = fernet.encrypt(orjson.dumps(oauth_config)).decode()
 
     print("\n" + "=" * 60)
     print(" Success! Your OAuth configuration has been securely encrypted.")
@@ -111,8 +112,8 @@ def get_credentials_and_generate_pointer(provider_key):
         "tags": ["oauth_config", provider_key]
     }
 
-    # Use textwrap to format the JSON nicely
-    formatted_json = textwrap.indent(json.dumps(pointer_payload, indent=4), '    ')
+    # Indent the pretty-printed JSON by one more level in a single pass
+    formatted_json = '\n'.join('    ' + line for line in json.dumps(pointer_payload, indent=4).splitlines())
     print("\n--- JSON Payload for create_pointer ---\n")
     print(formatted_json)
     print("\n---------------------------------------\n")
@@ -128,11 +129,3 @@ if __name__ == '__main__':
         get_credentials_and_generate_pointer(selected_provider)
     except (KeyboardInterrupt, EOFError):
         print("\n\nSetup cancelled. Exiting.")
-
-```
-
-### 2. `README.md` Update
-
-To make this new tool discoverable, I'll add a section to your `README.md` that explains its purpose and how to use it.
-
-```diff
\ No newline at end of file
@@ -0,0 +1,624 @@
+import base64
+import gc
+import sqlite3
+import threading
+import time
+import weakref
+
+import pytest
+
+import app
+
+
+ADMIN_CONTEXT = {'permissions': 'admin', 'key': 'test-admin-key', 'domain_id': 'dom_test'}
+
+
+@pytest.fixture
+def open_helper():
+    """Opens PointerHelpers on database paths and closes them all at teardown."""
+    helpers = []
+
+    def open_(path):
+        helpers.append(app.PointerHelper({'path': str(path)}))
+        return helpers[-1]
+
+    yield open_
+    for opened in helpers:
+        opened.close()
+
+
+@pytest.fixture
+def helper(open_helper, tmp_path):
+    """A PointerHelper on a fresh file database, so the background audit writer is running."""
+    return open_helper(tmp_path / 'butterfly.db')
+
+
+def audit_actions(helper):
+    helper.audit_module.flush()
+    return [row[0] for row in helper.db_manager.execute("SELECT action FROM audit_log ORDER BY id")]
+
+
+# --- Dispatch ---
+
+
+@pytest.mark.parametrize('action, method_name', sorted(app._ACTIONS.items()))
+def test_every_action_resolves_to_a_handler(action, method_name):
+    assert callable(getattr(app.PointerHelper, method_name, None)), f"{action} -> {method_name} is not defined"
+
+
+def test_unknown_action_is_reported(helper):
+    assert helper.invoke({'action': 'no_such_action'}) == {
+        'status': 'error', 'message': "Unknown action: 'no_such_action'"}
+
+
+# --- Audit log ---
+
+
+def test_clear_audit_log_inside_open_transaction_does_not_wait_on_writer(helper):
+    for i in range(5):
+        helper.audit_module.log('queued', str(i))
+    started = time.monotonic()
+    with helper.db_manager.deferred_commit():
+        helper._handle_create_pointer({'data_reference': 'https://example.com/a'})
+        result = helper._handle_clear_audit_log({'auth_context': ADMIN_CONTEXT})
+    assert result['status'] == 'success'
+    # Waiting on the writer here would stall for the full busy_timeout.
+    assert time.monotonic() - started < 1.0
+    assert audit_actions(helper)[0] == 'clear_audit_log'
+
+
+def test_read_only_action_leaves_its_audit_entry_to_the_writer(helper):
+    statements = []
+    helper.db_manager.conn.set_trace_callback(statements.append)
+    result = helper.invoke({'action': 'get_all_tags'})
+    helper.db_manager.conn.set_trace_callback(None)
+
+    assert result['status'] == 'success'
+    assert [s for s in statements if not s.lstrip().upper().startswith('SELECT')] == []
+    assert audit_actions(helper) == ['get_all_tags']
+
+
+def test_deferred_commit_rolls_back_when_the_block_raises(helper):
+    with pytest.raises(RuntimeError):
+        with helper.db_manager.deferred_commit():
+            helper._handle_create_pointer({'data_reference': 'https://example.com/a'})
+            helper.audit_module.log('in_request', 'x', durable=True)
+            raise RuntimeError
+    assert helper.db_manager.execute("SELECT COUNT(*) FROM pointers").fetchone()[0] == 0
+    assert 'in_request' not in audit_actions(helper)
+
+
+def test_commit_from_another_thread_does_not_end_an_open_deferred_block(helper):
+    started, release, committed = threading.Event(), threading.Event(), threading.Event()
+
+    def request():
+        with pytest.raises(RuntimeError):
+            with helper.db_manager.deferred_commit():
+                helper._handle_create_pointer({'data_reference': 'https://example.com/a'})
+                started.set()
+                release.wait(5)
+                raise RuntimeError
+
+    def other_thread():
+        started.wait(5)
+        helper.db_manager.commit()
+        committed.set()
+
+    threads = [threading.Thread(target=request), threading.Thread(target=other_thread)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    # The other thread's commit waits for the open block rather than committing its writes.
+    assert not committed.wait(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert committed.is_set()
+    assert helper.db_manager.execute("SELECT COUNT(*) FROM pointers").fetchone()[0] == 0
+
+
+def test_audit_writer_retries_a_batch_that_hits_a_locked_database(helper):
+    writer_conn = helper.audit_module._writer_db_manager.conn
+    writer_conn.execute("PRAGMA busy_timeout=0")
+    blocker = sqlite3.connect(helper.db_manager.db_path, check_same_thread=False)
+    blocker.execute("BEGIN IMMEDIATE")
+    helper.audit_module.log('while_locked', 'x')
+    time.sleep(0.3)
+    blocker.rollback()
+    blocker.close()
+    assert helper.audit_module.flush(timeout=5)
+    assert audit_actions(helper) == ['while_locked']
+
+
+def test_close_writes_queued_entries_and_releases_the_writer(tmp_path):
+    path = tmp_path / 'butterfly.db'
+    helper = app.PointerHelper({'path': str(path)})
+    writer = helper.audit_module._audit_writer
+    for i in range(250):
+        helper.audit_module.log('queued', str(i))
+
+    helper.close()
+    helper.close()
+
+    assert not writer.is_alive()
+    assert helper.db_manager.conn is None and helper.audit_module._writer_db_manager.conn is None
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM audit_log WHERE action = 'queued'").fetchone()[0] == 250
+
+
+def test_closed_helper_can_be_garbage_collected(tmp_path):
+    # Only possible once close() has taken its flush off the atexit list.
+    helper = app.PointerHelper({'path': str(tmp_path / 'butterfly.db')})
+    helper.close()
+    ref = weakref.ref(helper.audit_module)
+    del helper
+    gc.collect()
+    assert ref() is None
+
+
+# --- Pointers ---
+
+
+def create_pointer(helper, data_reference, **fields):
+    result = helper.invoke({'action': 'create_pointer', 'data_reference': data_reference, **fields})
+    assert result['status'] == 'success', result
+    return result['result']['pointer']
+
+
+def test_get_pointer_returns_the_pointer_and_its_neighbors(helper):
+    a = create_pointer(helper, 'https://example.com/a', description='a', tags=['t'])
+    b = create_pointer(helper, 'https://example.com/b', description='b')
+    helper.invoke({'action': 'add_neighbor', 'pointer_address': a['address'],
+                   'neighbor_address': b['address'], 'relationship': 'linked'})
+
+    result = helper.invoke({'action': 'get_pointer', 'pointer_address': a['address']})
+
+    assert result['status'] == 'success'
+    pointer = result['result']
+    assert pointer['description'] == 'a'
+    assert pointer['tags'] == ['t']
+    assert {'address': b['address'], 'relationship': 'linked', 'weight': 1.0} in pointer['neighbors']
+
+
+def test_get_pointer_reports_a_missing_pointer(helper):
+    result = helper.invoke({'action': 'get_pointer', 'pointer_address': 'ptr_missing'})
+    assert result == {'status': 'error', 'message': 'Pointer (SRL) not found: ptr_missing'}
+
+
+def test_add_neighbor_returns_the_updated_pointer(helper):
+    a = create_pointer(helper, 'https://example.com/a')
+    b = create_pointer(helper, 'https://example.com/b')
+    result = helper.invoke({'action': 'add_neighbor', 'pointer_address': a['address'],
+                            'neighbor_address': b['address']})
+    assert result['result']['pointer']['address'] == a['address']
+
+
+# --- Spatial index ---
+
+
+def proximity_addresses(helper, origin, radius):
+    result = helper.invoke({'action': 'search_by_proximity', 'origin_pointer_address': origin,
+                            'radius': radius, 'page_size': app.MAX_PAGE_SIZE})
+    assert result['status'] == 'success', result
+    return sorted(p['address'] for p in result['result']['pointers'])
+
+
+def make_line_of_pointers(helper, count=8):
+    """Pointers at x = 0..count-1 on a line, with a gap in the middle of the rowids."""
+    pointers = [create_pointer(helper, f'https://example.com/{i}', x=float(i), y=0.0) for i in range(count)]
+    for victim in pointers[2:4]:
+        helper.db_manager.execute("DELETE FROM pointers WHERE address = ?", (victim['address'],))
+    helper.db_manager.commit()
+    return pointers[:2] + pointers[4:]
+
+
+def test_rtree_is_keyed_on_the_pointer_id(helper):
+    make_line_of_pointers(helper)
+    ids = [row[0] for row in helper.db_manager.execute("SELECT id FROM pointers ORDER BY id")]
+    rtree_ids = [row[0] for row in helper.db_manager.execute("SELECT id FROM pointers_rtree ORDER BY id")]
+    assert rtree_ids == ids
+
+
+def test_pointer_id_is_the_integer_primary_key(helper):
+    # An INTEGER PRIMARY KEY is the rowid under a declared name, which VACUUM and
+    # dump/restore must preserve; the implicit rowid of a TEXT-keyed table is not.
+    columns = {row[1]: row for row in helper.db_manager.execute("PRAGMA table_info(pointers)")}
+    assert columns['id'][2] == 'INTEGER' and columns['id'][5] == 1
+
+
+def test_spatial_index_matches_after_vacuum(helper):
+    pointers = make_line_of_pointers(helper)
+    helper.db_manager.execute("VACUUM")
+    origin = pointers[2]['address']  # x = 4.0
+    assert proximity_addresses(helper, origin, 1.5) == [pointers[3]['address']]
+    assert proximity_addresses(helper, origin, 4.5) == sorted(
+        p['address'] for p in pointers if p['address'] != origin)
+
+
+def test_pointers_table_without_integer_key_is_migrated(open_helper, tmp_path):
+    path = tmp_path / 'legacy.db'
+    conn = sqlite3.connect(path)
+    conn.execute('''CREATE TABLE pointers
+        (address TEXT PRIMARY KEY, description TEXT, data_reference TEXT NOT NULL UNIQUE, tags TEXT,
+         connection_id TEXT, credential_pointer_address TEXT, x REAL DEFAULT 0.0, y REAL DEFAULT 0.0,
+         z INTEGER DEFAULT 0, created_at TEXT NOT NULL, last_modified TEXT NOT NULL)''')
+    conn.executemany(
+        "INSERT INTO pointers (rowid, address, data_reference, tags, x, created_at, last_modified) VALUES (?, ?, ?, '[]', ?, 't', 't')",
+        [(1, 'ptr_a', 'ref_a', 0.0), (5, 'ptr_b', 'ref_b', 1.0), (9, 'ptr_c', 'ref_c', 10.0)])
+    conn.commit()
+    conn.close()
+
+    helper = open_helper(path)
+
+    rows = helper.db_manager.execute("SELECT id, address, data_reference FROM pointers ORDER BY id").fetchall()
+    assert [tuple(row) for row in rows] == [(1, 'ptr_a', 'ref_a'), (5, 'ptr_b', 'ref_b'), (9, 'ptr_c', 'ref_c')]
+    assert proximity_addresses(helper, 'ptr_a', 2.0) == ['ptr_b']
+    created = create_pointer(helper, 'https://example.com/new', x=0.5, y=0.0)
+    assert proximity_addresses(helper, 'ptr_a', 2.0) == sorted(['ptr_b', created['address']])
+
+
+@pytest.mark.skipif(app.np is None, reason="NumPy fallback needs numpy")
+def test_numpy_fallback_sees_coordinate_updates_and_replaced_rows(helper):
+    helper.audit_module.has_rtree = False
+    origin = create_pointer(helper, 'https://example.com/origin', x=0.0, y=0.0)
+    moving = create_pointer(helper, 'https://example.com/moving', x=10.0, y=0.0)
+    assert proximity_addresses(helper, origin['address'], 2.0) == []
+
+    helper.db_manager.execute("UPDATE pointers SET x = 1.0 WHERE address = ?", (moving['address'],))
+    helper.db_manager.commit()
+    assert proximity_addresses(helper, origin['address'], 2.0) == [moving['address']]
+
+    # Deleting the newest row and inserting another reuses its id, leaving MAX(id) and
+    # COUNT(*) unchanged.
+    helper.db_manager.execute("DELETE FROM pointers WHERE address = ?", (moving['address'],))
+    helper.db_manager.commit()
+    replacement = create_pointer(helper, 'https://example.com/replacement', x=1.5, y=0.0)
+    assert proximity_addresses(helper, origin['address'], 2.0) == [replacement['address']]
+
+
+# --- Description search ---
+
+
+def search_descriptions(helper, term):
+    result = helper.invoke({'action': 'search_pointers', 'search_term': term, 'page_size': app.MAX_PAGE_SIZE})
+    assert result['status'] == 'success', result
+    return sorted(p['description'] for p in result['result']['pointers'])
+
+
+def test_description_search_follows_updates_deletes_and_vacuum(helper):
+    pointers = [create_pointer(helper, f'https://example.com/{i}', description=f'Item number {i}') for i in range(6)]
+    helper.db_manager.execute("DELETE FROM pointers WHERE address = ?", (pointers[1]['address'],))
+    helper.db_manager.execute("UPDATE pointers SET description = 'Renamed entry' WHERE address = ?",
+                              (pointers[4]['address'],))
+    helper.db_manager.commit()
+    helper.db_manager.execute("VACUUM")
+
+    assert search_descriptions(helper, 'number') == ['Item number 0', 'Item number 2', 'Item number 3', 'Item number 5']
+    assert search_descriptions(helper, 'renamed') == ['Renamed entry']
+
+
+def test_fts_table_keyed_on_rowid_is_recreated_on_id(open_helper, tmp_path):
+    path = str(tmp_path / 'butterfly.db')
+    helper = open_helper(path)
+    create_pointer(helper, 'https://example.com/a', description='Alpha pointer')
+    db = helper.db_manager
+    db.execute("DROP TABLE pointers_fts")
+    db.execute("CREATE VIRTUAL TABLE pointers_fts USING fts5(description, content='pointers', content_rowid='rowid', tokenize='trigram')")
+    db.execute("INSERT INTO pointers_fts (pointers_fts) VALUES ('rebuild')")
+    db.commit()
+
+    reopened = open_helper(path)
+
+    sql = reopened.db_manager.execute("SELECT sql FROM sqlite_master WHERE name = 'pointers_fts'").fetchone()[0]
+    assert "content_rowid='id'" in sql
+    assert search_descriptions(reopened, 'alpha') == ['Alpha pointer']
+
+
+# --- Tag index ---
+
+
+def all_tags(helper):
+    return helper.invoke({'action': 'get_all_tags'})['result']['tags']
+
+
+def test_only_array_tags_are_indexed(helper):
+    create_pointer(helper, 'https://example.com/a', tags=['x', 'y'])
+    create_pointer(helper, 'https://example.com/b', tags='solo')
+    create_pointer(helper, 'https://example.com/c', tags={'k': 'v'})
+    assert all_tags(helper) == ['x', 'y']
+    assert helper.invoke({'action': 'find_pointers_by_tag', 'tag': 'solo'})['result']['pointers'] == []
+
+
+def test_updating_tags_to_a_scalar_clears_the_index(helper):
+    a = create_pointer(helper, 'https://example.com/a', tags=['x'])
+    helper.db_manager.execute("UPDATE pointers SET tags = '\"x\"' WHERE address = ?", (a['address'],))
+    helper.db_manager.commit()
+    assert all_tags(helper) == []
+
+
+def test_stale_tag_triggers_are_replaced_on_startup(open_helper, tmp_path):
+    path = str(tmp_path / 'butterfly.db')
+    helper = open_helper(path)
+    db = helper.db_manager
+    db.execute("DROP TRIGGER pointers_tags_ai")
+    db.execute('''CREATE TRIGGER pointers_tags_ai AFTER INSERT ON pointers BEGIN
+        INSERT OR IGNORE INTO pointer_tags (pointer_address, tag)
+        SELECT NEW.address, value FROM json_each(NEW.tags) WHERE value IS NOT NULL; END''')
+    db.commit()
+    create_pointer(helper, 'https://example.com/a', tags='solo')
+    assert all_tags(helper) == ['solo']
+
+    reopened = open_helper(path)
+
+    assert all_tags(reopened) == []
+    create_pointer(reopened, 'https://example.com/b', tags='other')
+    assert all_tags(reopened) == []
+
+
+# --- Connection access ---
+
+
+def make_connection_with_federations(helper):
+    """conn_owner in dom_owner, with accepted federations in either direction and a pending one."""
+    db = helper.db_manager.conn
+    db.executemany("INSERT INTO domains (id, name, created_at) VALUES (?, ?, 't')",
+                   [(d, d) for d in ('dom_owner', 'dom_partner', 'dom_reverse', 'dom_pending', 'dom_other')])
+    db.execute("INSERT INTO connections (id, name, domain_id) VALUES ('conn_owner', 'owner', 'dom_owner')")
+    db.executemany(
+        "INSERT INTO federations (id, source_domain_id, target_domain_id, status, permissions, request_key, created_at)"
+        " VALUES (?, ?, ?, ?, '[]', ?, 't')",
+        [('fed_1', 'dom_partner', 'dom_owner', 'accepted', 'k1'),
+         ('fed_2', 'dom_owner', 'dom_reverse', 'accepted', 'k2'),
+         ('fed_3', 'dom_pending', 'dom_owner', 'pending', 'k3')])
+    db.commit()
+    return 'conn_owner'
+
+
+def as_domain(domain_id):
+    return {'permissions': 'read', 'key': 'test-key-' + domain_id, 'domain_id': domain_id}
+
+
+CONNECTION_DENIED = {'status': 'error',
+                     'message': 'Access denied. The provided key is not valid for the domain containing this connection.'}
+
+
+@pytest.mark.parametrize('domain_id', ['dom_owner', 'dom_partner', 'dom_reverse'])
+def test_invoke_through_connection_runs_for_owner_and_federated_domains(helper, domain_id):
+    connection_id = make_connection_with_federations(helper)
+    circuit = helper.invoke({'action': 'create_circuit', 'description': 'apis',
+                             'circuit_definition': [{'action': 'get_available_apis'}]})['result']['pointer']
+    helper.db_manager.execute("UPDATE pointers SET connection_id = ? WHERE address = ?",
+                              (connection_id, circuit['address']))
+    helper.db_manager.commit()
+
+    result = helper.invoke({'action': 'invoke_through_connection', 'connection_id': connection_id,
+                            'pointer_address': circuit['address'], 'auth_context': as_domain(domain_id)})
+
+    assert result['status'] == 'success', result
+    assert result['result'][0]['edition'] == app._current_edition()
+
+
+@pytest.mark.parametrize('domain_id', ['dom_pending', 'dom_other'])
+def test_invoke_through_connection_denies_unfederated_domains(helper, domain_id):
+    connection_id = make_connection_with_federations(helper)
+    result = helper.invoke({'action': 'invoke_through_connection', 'connection_id': connection_id,
+                            'pointer_address': 'ptr_any', 'auth_context': as_domain(domain_id)})
+    assert result == CONNECTION_DENIED
+
+
+def test_invoke_through_connection_reports_a_missing_pointer(helper):
+    connection_id = make_connection_with_federations(helper)
+    result = helper.invoke({'action': 'invoke_through_connection', 'connection_id': connection_id,
+                            'pointer_address': 'ptr_missing', 'auth_context': as_domain('dom_partner')})
+    assert result == {'status': 'error', 'message': 'Pointer (SRL) not found: ptr_missing'}
+
+
+def pages_for_connection(helper, connection_id, domain_id, page_size):
+    pages, cursor = [], None
+    while True:
+        result = helper.invoke({'action': 'get_pointers_for_connection', 'connection_id': connection_id,
+                                'auth_context': as_domain(domain_id), 'page_size': page_size, 'cursor': cursor})
+        assert result['status'] == 'success', result
+        pages.append([p['address'] for p in result['result']['pointers']])
+        cursor = result['result']['next_cursor']
+        if cursor is None:
+            return pages
+
+
+@pytest.mark.parametrize('domain_id', ['dom_owner', 'dom_partner', 'dom_reverse'])
+def test_get_pointers_for_connection_pages_across_cursor_boundaries(helper, domain_id):
+    connection_id = make_connection_with_federations(helper)
+    pointers = [create_pointer(helper, f'https://example.com/{i}') for i in range(5)]
+    create_pointer(helper, 'https://example.com/elsewhere')
+    # Three pointers share a created_at, so a page boundary falls inside the tie and the
+    # cursor has to break it on address.
+    created_at = ['2024-01-01', '2024-01-02', '2024-01-02', '2024-01-02', '2024-01-03']
+    for pointer, at in zip(pointers, created_at):
+        helper.db_manager.execute("UPDATE pointers SET connection_id = ?, created_at = ? WHERE address = ?",
+                                  (connection_id, at, pointer['address']))
+    helper.db_manager.commit()
+    expected = [p['address'] for p in sorted(pointers, key=lambda p: (created_at[pointers.index(p)], p['address']))]
+
+    pages = pages_for_connection(helper, connection_id, domain_id, page_size=2)
+
+    assert [len(page) for page in pages] == [2, 2, 1]
+    assert [address for page in pages for address in page] == expected
+
+
+@pytest.mark.parametrize('domain_id', ['dom_pending', 'dom_other'])
+def test_get_pointers_for_connection_denies_unfederated_domains(helper, domain_id):
+    connection_id = make_connection_with_federations(helper)
+    result = helper.invoke({'action': 'get_pointers_for_connection', 'connection_id': connection_id,
+                            'auth_context': as_domain(domain_id)})
+    assert result == CONNECTION_DENIED
+
+
+# --- Creation model ---
+
+
+def test_fetch_pointer_with_proximity_returns_neighbors_and_nearby(helper):
+    origin = create_pointer(helper, 'https://example.com/origin', x=0.0, y=0.0)
+    near = create_pointer(helper, 'https://example.com/near', description='near', x=1.0, y=1.0)
+    create_pointer(helper, 'https://example.com/far', x=9.0, y=0.0)
+    helper.invoke({'action': 'add_neighbor', 'pointer_address': origin['address'],
+                   'neighbor_address': near['address']})
+
+    pointer, nearby = helper._fetch_pointer_with_proximity(origin['address'], 5.0)
+
+    assert pointer['address'] == origin['address']
+    assert [n['address'] for n in pointer['neighbors']] == [near['address']]
+    assert nearby == [{'address': near['address'], 'description': 'near'}]
+    assert helper._fetch_pointer_with_proximity('ptr_missing', 5.0) == (None, [])
+
+
+def test_execute_creation_model_runs_the_full_cycle(helper):
+    origin = create_pointer(helper, 'https://example.com/origin', tags=['public'], x=0.0, y=0.0)
+    near = create_pointer(helper, 'https://example.com/near', x=2.0, y=0.0)
+
+    result = helper.invoke({'action': 'execute_creation_model', 'pointer_address': origin['address']})
+
+    assert result['status'] == 'creation_model_complete'
+    assert result['_cycle_status'] == {'status': 'Cycle advanced.'}
+    analysis = result['result']['logical_analysis']
+    assert analysis['logic_gate'] == {'is_secure_url': True, 'is_public_and_connected': False}
+    assert [p['address'] for p in analysis['proximity_analysis']['nearby_pointers']] == [near['address']]
+    assert helper.cycle_module._active_cycles == {}
+
+    again = helper.invoke({'action': 'execute_creation_model', 'pointer_address': origin['address']})
+    assert again['result']['shortcut_pointer_address'] == result['result']['shortcut_pointer_address']
+
+
+def test_cycle_resets_after_reaching_the_limit():
+    cycles = app.CycleModule()
+    cycles.start_cycle('op')
+    statuses = [cycles.advance_cycle('op', is_optimal=True)['status'] for _ in range(6)]
+    assert statuses[:5] == ['Cycle advanced.'] * 5
+    assert statuses[5].startswith('Cycle complete.')
+    assert cycles._active_cycles['op'] == cycles.RESET_STATE
+
+
+# --- Bearer tokens ---
+
+
+SECRET = 'test-secret-of-at-least-thirty-two-bytes'
+
+
+def make_token(payload, secret=SECRET, algorithm='HS256'):
+    return app.jwt.encode(payload, secret, algorithm=algorithm)
+
+
+@pytest.fixture
+def token_secret(monkeypatch):
+    monkeypatch.setitem(app.app.config, 'SECRET_KEY', SECRET)
+    app._token_cache.clear()
+    yield SECRET
+    app._token_cache.clear()
+
+
+@pytest.mark.parametrize('fast_jwt', [False, True])
+def test_decode_token_caches_a_token_with_a_numeric_string_exp(token_secret, monkeypatch, fast_jwt):
+    monkeypatch.setattr(app, 'FAST_JWT', fast_jwt)
+    token = make_token({'access_key': 'k', 'exp': str(int(time.time()) + 600)})
+
+    assert app._decode_token(token)['access_key'] == 'k'
+    assert app._token_cache.get(token) is not None
+
+
+def _with_segment(token, index, value):
+    segments = token.split('.')
+    segments[index] = value
+    return '.'.join(segments)
+
+
+def _b64url(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _parity_tokens():
+    now = int(time.time())
+    valid = make_token({'access_key': 'k', 'exp': now + 600})
+    header, payload, signature = valid.split('.')
+    flipped = ('A' if signature[0] != 'A' else 'B') + signature[1:]
+    return {
+        'valid': valid,
+        'valid_numeric_string_exp': make_token({'access_key': 'k', 'exp': str(now + 600)}),
+        'tampered_signature': _with_segment(valid, 2, flipped),
+        'tampered_payload': _with_segment(valid, 1, make_token({'access_key': 'other'}).split('.')[1]),
+        'wrong_secret': make_token({'access_key': 'k'}, secret=SECRET + '-other'),
+        'alg_none': make_token({'access_key': 'k'}, secret=None, algorithm='none'),
+        'alg_hs512': make_token({'access_key': 'k'}, secret=SECRET * 2, algorithm='HS512'),
+        'expired': make_token({'access_key': 'k', 'exp': now - 10}),
+        'not_yet_valid': make_token({'access_key': 'k', 'nbf': now + 600}),
+        'missing_required_claim': make_token({'exp': now + 600}),
+        'signed_non_json_payload': app.jwt.api_jws.encode(b'not json', SECRET, algorithm='HS256'),
+        'signed_array_payload': app.jwt.api_jws.encode(b'[1]', SECRET, algorithm='HS256'),
+        'too_few_segments': f'{header}.{payload}',
+        'too_many_segments': f'{valid}.{signature}',
+        'empty': '',
+        'bad_padding_signature': _with_segment(valid, 2, signature + 'A'),
+        'bad_padding_payload': _with_segment(valid, 1, payload + 'A'),
+        'non_base64_header': _with_segment(valid, 0, '!!!!'),
+        'non_json_header': _with_segment(valid, 0, _b64url(b'not json')),
+        'array_header': _with_segment(valid, 0, _b64url(b'[]')),
+        'string_header': _with_segment(valid, 0, _b64url(b'"x"')),
+        'header_without_alg': _with_segment(valid, 0, _b64url(b'{"typ": "JWT"}')),
+    }
+
+
+def _outcome(decode, token):
+    try:
+        return decode(token)
+    except app.jwt.InvalidTokenError as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('name, token', sorted(_parity_tokens().items()))
+def test_decode_hs256_matches_pyjwt(token_secret, name, token):
+    expected = _outcome(lambda t: app.jwt.decode(t, SECRET, algorithms=['HS256'],
+                                                 options={'require': list(app._REQUIRED_CLAIMS)}), token)
+    actual = _outcome(lambda t: app._decode_hs256(t, SECRET, require=app._REQUIRED_CLAIMS), token)
+    assert actual == expected
+    if name.startswith('valid'):
+        assert isinstance(actual, dict) and actual['access_key'] == 'k'
+    else:
+        assert isinstance(expected, type)
+
+
+# --- /invoke endpoint ---
+
+
+@pytest.fixture
+def client(helper, token_secret, monkeypatch):
+    monkeypatch.setattr(app, 'butterfly_helper', helper)
+    # Both are normally set by main() at startup.
+    monkeypatch.setattr(app, '_config', {}, raising=False)
+    helper.db_manager.execute("INSERT INTO domains (id, name, created_at) VALUES ('dom_client', 'client', 't')")
+    helper.db_manager.execute(
+        "INSERT INTO access_keys (key, domain_id, permissions, created_at) VALUES ('key_client', 'dom_client', '[]', 't')")
+    helper.db_manager.commit()
+    headers = {'Authorization': 'Bearer ' + make_token({'access_key': 'key_client', 'exp': int(time.time()) + 600})}
+    return app.app.test_client(), headers
+
+
+def test_invoke_accepts_base64_fernet_bodies(client, helper):
+    test_client, headers = client
+    body = helper.encryption_module.encrypt({'action': 'get_all_tags'})
+    response = test_client.post('/invoke', data=body, headers={**headers, 'Content-Type': 'text/plain'})
+    assert response.status_code == 200 and response.mimetype == 'text/plain'
+    assert helper.encryption_module.decrypt(response.get_data()) == {'status': 'success', 'result': {'tags': []}}
+
+
+def test_invoke_accepts_raw_fernet_bodies(client, helper):
+    test_client, headers = client
+    body = helper.encryption_module.encrypt_raw({'action': 'get_all_tags'})
+    response = test_client.post('/invoke', data=body, headers={**headers, 'Content-Type': 'application/octet-stream'})
+    assert response.status_code == 200 and response.mimetype == 'application/octet-stream'
+    assert helper.encryption_module.decrypt_raw(response.get_data()) == {'status': 'success', 'result': {'tags': []}}
+
+
+def test_invoke_rejects_a_truncated_raw_body(client, helper):
+    test_client, headers = client
+    body = helper.encryption_module.encrypt_raw({'action': 'get_all_tags'})[:-1]
+    response = test_client.post('/invoke', data=body, headers={**headers, 'Content-Type': 'application/octet-stream'})
+    assert response.status_code == 400
+    assert helper.encryption_module.decrypt_raw(response.get_data())['status'] == 'error'
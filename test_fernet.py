@@ -0,0 +1,80 @@
+import base64
+
+import pytest
+from cryptography.fernet import Fernet as ReferenceFernet, InvalidToken
+
+from _fernet import Fernet, RawFernet
+
+
+@pytest.fixture
+def key():
+    return ReferenceFernet.generate_key()
+
+
+def to_raw(token):
+    return base64.urlsafe_b64decode(token)
+
+
+def from_raw(token):
+    return base64.urlsafe_b64encode(token)
+
+
+def test_raw_round_trip(key):
+    raw = RawFernet(key)
+    for message in (b'', b'x', b'a' * 16, b'{"action": "get_pointer"}' * 50):
+        assert raw.decrypt(raw.encrypt(message)) == message
+
+
+@pytest.mark.parametrize('fernet_class', [Fernet, ReferenceFernet])
+def test_raw_tokens_interoperate_with_fernet(key, fernet_class):
+    raw, fernet = RawFernet(key), fernet_class(key)
+    assert fernet.decrypt(from_raw(raw.encrypt(b'from raw'))) == b'from raw'
+    assert raw.decrypt(to_raw(fernet.encrypt(b'from fernet'))) == b'from fernet'
+
+
+def test_raw_token_is_the_decoded_fernet_token_layout(key):
+    token = RawFernet(key).encrypt(b'payload')
+    # version || timestamp || IV || one padded block || HMAC
+    assert token[:1] == b'\x80' and len(token) == 1 + 8 + 16 + 16 + 32
+
+
+@pytest.mark.parametrize('position', [-1, -32, 30, 1])
+def test_tampered_raw_token_is_rejected(key, position):
+    raw = RawFernet(key)
+    token = bytearray(raw.encrypt(b'payload'))
+    token[position] ^= 0x01
+    with pytest.raises(InvalidToken):
+        raw.decrypt(bytes(token))
+
+
+@pytest.mark.parametrize('length', [0, 1, 9, 72])
+def test_truncated_raw_token_is_rejected(key, length):
+    raw = RawFernet(key)
+    with pytest.raises(InvalidToken):
+        raw.decrypt(raw.encrypt(b'payload')[:length])
+
+
+def test_raw_token_with_an_unknown_version_is_rejected(key):
+    raw = RawFernet(key)
+    with pytest.raises(InvalidToken):
+        raw.decrypt(b'\x81' + raw.encrypt(b'payload')[1:])
+
+
+def test_raw_token_from_another_key_is_rejected(key):
+    token = RawFernet(ReferenceFernet.generate_key()).encrypt(b'payload')
+    with pytest.raises(InvalidToken):
+        RawFernet(key).decrypt(token)
+
+
+def test_expired_raw_token_is_rejected(key, monkeypatch):
+    raw = RawFernet(key)
+    token = raw.encrypt(b'payload')
+    assert raw.decrypt(token, ttl=60) == b'payload'
+    monkeypatch.setattr('_fernet.time.time', lambda: 10**10)
+    with pytest.raises(InvalidToken):
+        raw.decrypt(token, ttl=60)
+
+
+def test_raw_fernet_rejects_a_short_key():
+    with pytest.raises(ValueError):
+        RawFernet(base64.urlsafe_b64encode(b'k' * 16))
@@ -2,6 +2,27 @@ import os
 import subprocess
 import time
 import pytest
+import requests
+
+BASE_URL = "http://localhost:5001"
+STARTUP_TIMEOUT = 30  # seconds
+
+_SESSION = requests.Session()
+
+def wait_for_server(process, url=BASE_URL, timeout=STARTUP_TIMEOUT):
+    """Polls the server with exponential backoff until it answers or the timeout expires."""
+    deadline = time.monotonic() + timeout
+    delay = 0.05
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            _SESSION.get(url, timeout=0.5)
+            return True
+        except requests.exceptions.RequestException:
+            time.sleep(delay)
+            delay = min(delay * 2, 1.0)
+    return False
 
 @pytest.fixture(scope="module")
 def running_server():
@@ -13,14 +34,16 @@ def running_server():
     os.environ['JWT_SECRET_KEY'] = "ci-test-secret-key"
 
     # Run the first-time setup wizard non-interactively
-    setup_process = subprocess.run("printf 'y\\n1\\ny\\nadmin-app\\n' | python app.py", shell=True, capture_output=True)
+    setup_process = subprocess.run(["python", "app.py"], input=b"y\n1\ny\nadmin-app\n", capture_output=True)
     assert setup_process.returncode == 0, "Setup wizard failed to run."
 
     # Start the server in the background
     server_process = subprocess.Popen(["python", "app.py"])
 
-    # Wait for the server to initialize
-    time.sleep(15)
+    # Wait for the server to start answering requests
+    if not wait_for_server(server_process):
+        server_process.terminate()
+        pytest.fail("Server did not become ready in time.")
 
     yield  # This is where the tests will run
 